@@ -15,6 +15,7 @@ import asyncio
 import aiohttp
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import uuid
+from response_cache import ResponseCache
 
 # 🧠 增强版LLM分析器 - 支持模拟模式和真实API
 # 
@@ -75,6 +76,13 @@ class AdvancedLLMAnalyzer:
         
         self.config = config or {}
         
+        # 复用HTTP连接（keep-alive），避免每次请求重复TLS握手
+        self.session = requests.Session()
+        
+        # 可选的响应磁盘缓存（配置 response_cache_path 后启用）
+        cache_path = self.config.get('response_cache_path')
+        self.response_cache = ResponseCache(cache_path) if cache_path else None
+        
         # 定义评估维度
         self.evaluation_dimensions = {
             'factual_accuracy': '事实准确性',
@@ -231,6 +239,12 @@ class AdvancedLLMAnalyzer:
         else:
             return self.create_evaluation_prompt(reference, generated, "comprehensive")
 
+    def _response_cache_key(self, prompt: str, mode: str) -> Optional[str]:
+        """生成响应缓存键，未启用缓存时返回None"""
+        if self.response_cache is None:
+            return None
+        return ResponseCache.make_key(prompt, self.config.get('url', ''), self.config.get('robot_key', ''), mode)
+
     def send_evaluation_request(self, prompt: str, timeout: int = 120, max_retries: int = 3) -> str:
         """
         发送评估请求到API - 优化504错误处理
@@ -243,13 +257,19 @@ class AdvancedLLMAnalyzer:
         Returns:
             str: API响应结果
         """
+        cache_key = self._response_cache_key(prompt, 'plain')
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                self.logger.info("命中响应缓存")
+                return cached
         
         for attempt in range(max_retries):
             try:
                 # 记录请求开始
                 self.logger.info(f"发送API请求 (尝试 {attempt + 1}/{max_retries})")
                 
-                response = requests.post(
+                response = self.session.post(
                     self.config['url'],
                     json={
                         'username': self.config['username'],
@@ -270,10 +290,14 @@ class AdvancedLLMAnalyzer:
                         if 'data' in result and 'answer' in result['data']:
                             content = result['data']['answer']
                             self.logger.info(f"API请求成功 (尝试 {attempt + 1})")
+                            if cache_key is not None:
+                                self.response_cache.set(cache_key, content)
                             return content
                         else:
                             content = str(result.get('data', {}))
                             self.logger.info(f"API请求成功 (尝试 {attempt + 1})")
+                            if cache_key is not None:
+                                self.response_cache.set(cache_key, content)
                             return content
                     else:
                         error_msg = result.get('message', 'Unknown error')
@@ -335,6 +359,13 @@ class AdvancedLLMAnalyzer:
         Returns:
             Dict: 包含响应内容和时间指标的字典
         """
+        # 缓存命中时返回首次请求记录的原始时间指标
+        cache_key = self._response_cache_key(prompt, 'streaming')
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                self.logger.info("命中响应缓存")
+                return cached
         
         for attempt in range(max_retries):
             try:
@@ -356,7 +387,7 @@ class AdvancedLLMAnalyzer:
                 }
                 
                 # 发送流式请求
-                response = requests.post(
+                response = self.session.post(
                     self.config['url'],
                     json=data,
                     headers=headers,
@@ -367,11 +398,12 @@ class AdvancedLLMAnalyzer:
                 if response.status_code == 200:
                     # 首字响应时间
                     first_byte_time = None
-                    # 完整内容
-                    full_content = ""
+                    # 完整内容（按到达的数据块累积，结束后统一解码）
+                    buf = bytearray()
+                    chunk_count = 0
                     
                     # 逐块读取响应
-                    for chunk in response.iter_content(chunk_size=1, decode_unicode=True):
+                    for chunk in response.iter_content(chunk_size=None):
                         if chunk:
                             # 记录首字响应时间
                             if first_byte_time is None:
@@ -379,7 +411,10 @@ class AdvancedLLMAnalyzer:
                                 first_token_response_time = first_byte_time - request_start_time
                                 self.logger.info(f"首字响应时间: {first_token_response_time:.3f}秒")
                             
-                            full_content += chunk
+                            buf += chunk
+                            chunk_count += 1
+                    
+                    full_content = bytes(buf).decode('utf-8')
                     
                     # 总响应时间
                     total_response_time = time.time() - request_start_time
@@ -390,26 +425,34 @@ class AdvancedLLMAnalyzer:
                         if result.get('code') == '000000':
                             content = result['data']['answer'] if 'data' in result and 'answer' in result['data'] else str(result.get('data', {}))
                             
-                            return {
+                            response_data = {
                                 'content': content,
                                 'first_token_response_time': first_token_response_time if first_byte_time else None,
                                 'total_response_time': total_response_time,
+                                'chunk_count': chunk_count,
                                 'success': True,
                                 'attempt': attempt + 1
                             }
+                            if cache_key is not None:
+                                self.response_cache.set(cache_key, response_data)
+                            return response_data
                         else:
                             error_msg = result.get('message', 'Unknown error')
                             self.logger.warning(f"API返回错误: {error_msg}")
                             raise Exception(f"API错误: {error_msg}")
                     except json.JSONDecodeError:
                         # 如果不是JSON格式，直接返回文本内容
-                        return {
+                        response_data = {
                             'content': full_content,
                             'first_token_response_time': first_token_response_time if first_byte_time else None,
                             'total_response_time': total_response_time,
+                            'chunk_count': chunk_count,
                             'success': True,
                             'attempt': attempt + 1
                         }
+                        if cache_key is not None:
+                            self.response_cache.set(cache_key, response_data)
+                        return response_data
                 else:
                     self.logger.warning(f"HTTP错误: {response.status_code}")
                     raise Exception(f"HTTP错误: {response.status_code}")
@@ -591,6 +634,7 @@ class AdvancedLLMAnalyzer:
                     result['first_token_response_time'] = response_data['first_token_response_time']
                     result['total_response_time'] = response_data['total_response_time']
                     result['api_attempt'] = response_data['attempt']
+                    result['chunk_count'] = response_data.get('chunk_count')
                 else:
                     result = self._get_error_evaluation_result("comprehensive")
             else:
@@ -605,6 +649,7 @@ class AdvancedLLMAnalyzer:
                     result['first_token_response_time'] = response_data['first_token_response_time']
                     result['total_response_time'] = response_data['total_response_time']
                     result['api_attempt'] = response_data['attempt']
+                    result['chunk_count'] = response_data.get('chunk_count')
                 else:
                     result = self._get_error_evaluation_result("tire_business")
             else:
@@ -620,6 +665,7 @@ class AdvancedLLMAnalyzer:
                     result['first_token_response_time'] = response_data['first_token_response_time']
                     result['total_response_time'] = response_data['total_response_time']
                     result['api_attempt'] = response_data['attempt']
+                    result['chunk_count'] = response_data.get('chunk_count')
                 else:
                     result = self._get_error_evaluation_result("agent_comparison")
             else:
@@ -635,6 +681,7 @@ class AdvancedLLMAnalyzer:
                     result['first_token_response_time'] = response_data['first_token_response_time']
                     result['total_response_time'] = response_data['total_response_time']
                     result['api_attempt'] = response_data['attempt']
+                    result['chunk_count'] = response_data.get('chunk_count')
                 else:
                     result = self._get_error_evaluation_result("comprehensive")
             else:
@@ -775,6 +822,12 @@ class AdvancedLLMAnalyzer:
                 df.loc[i, 'llm_comparison_winner'] = comp_analysis.get('winner', 'unknown')
                 df.loc[i, 'llm_comparison_confidence'] = comp_analysis.get('confidence_level', 'low')
                 df.loc[i, 'llm_detailed_analysis'] = comp_analysis.get('detailed_analysis', '')
+        
+        # 流式响应时间指标
+        for i, result in enumerate(results):
+            for key in ('first_token_response_time', 'total_response_time', 'api_attempt', 'chunk_count'):
+                if result.get(key) is not None:
+                    df.loc[i, f'llm_{key}'] = result[key]
 
     def _add_partial_results_to_df(self, df: pd.DataFrame, results: List[Dict], analysis_type: str):
         """
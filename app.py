@@ -10,6 +10,7 @@ st.set_page_config(
 
 import os
 import ast
+import uuid
 import logging
 import pandas as pd
 from datetime import datetime
@@ -498,9 +499,15 @@ def save_analyzer_config(config_dict):
     if file_manager.is_cloud:
         st.info("💾 配置已保存到会话中（云端模式）")
 
+def new_agents_version():
+    """Generate a token identifying the current agents table"""
+    # A random token rather than a counter: the selector cache is shared across sessions
+    return uuid.uuid4().hex
+
 def save_agents(df):
     """Save agents to CSV file"""
     file_manager.save_csv(df, './public/agents.csv', index=False)
+    st.session_state.agents_version = new_agents_version()
     if file_manager.is_cloud:
         st.info("💾 Agent配置已保存到会话中（云端模式）")
 
@@ -817,6 +824,7 @@ def main():
     # Load agents and analyzer config
     if 'agents_df' not in st.session_state:
         st.session_state.agents_df = load_agents()
+        st.session_state.agents_version = new_agents_version()
     
     if 'analyzer_config' not in st.session_state:
         st.session_state.analyzer_config = load_analyzer_config()
@@ -939,31 +947,30 @@ def main():
         from ui_components import AgentSelectionComponents
         
         agents = st.session_state.agents_df
+        agents_version = st.session_state.get('agents_version')
         
         if analysis_mode == "单机器人分析":
-            selected_agent = AgentSelectionComponents.show_agent_cards(agents, "_analysis")
+            selected_agent = AgentSelectionComponents.show_agent_cards(agents, "_analysis", agents_version)
             
             if selected_agent is None:
                 st.stop()
             
             # Get selected agent's credentials as dictionary
-            agent_creds = agents[agents['name'] == selected_agent].iloc[0].to_dict()
+            agent_creds = AgentSelectionComponents.agents_by_name(agents, agents_version)[selected_agent]
             
             # Initialize analyzer with selected agent's credentials and analyzer config
             analyzer = QAAnalyzer(agent_creds, st.session_state.analyzer_config)
             selected_agents = [selected_agent]
             
         else:  # 多机器人对比分析
-            selected_agents = AgentSelectionComponents.show_multi_agent_selection(agents, "_multi_analysis")
+            selected_agents = AgentSelectionComponents.show_multi_agent_selection(agents, "_multi_analysis", agents_version)
             
             if not selected_agents:
                 st.stop()
             
             # 为多机器人分析准备配置
-            agents_configs = []
-            for agent_name in selected_agents:
-                agent_creds = agents[agents['name'] == agent_name].iloc[0].to_dict()
-                agents_configs.append(agent_creds)
+            agents_by_name = AgentSelectionComponents.agents_by_name(agents, agents_version)
+            agents_configs = [agents_by_name[agent_name] for agent_name in selected_agents]
             
             # 初始化多机器人分析器
             from multi_agent_analyzer import MultiAgentAnalyzer
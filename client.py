@@ -2,16 +2,61 @@ import json
 import ssl
 import traceback
 import logging
+import asyncio
+from contextlib import contextmanager
+from types import SimpleNamespace
+import websockets
+from websockets.protocol import State
 from websockets.sync.client import connect
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import threading
 import socket
+from collections import deque
 
 class TimeoutError(Exception):
     """Exception raised when a function times out."""
     pass
 
+class TokenBucket:
+    """Thread-safe token bucket rate limiter"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Initialize token bucket
+        
+        Args:
+            rate: Tokens added per second (sustained requests per second)
+            burst: Maximum number of tokens, i.e. requests allowed back to back
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take one token and return how long the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self):
+        """Block until a token is available"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Wait until a token is available without blocking the event loop"""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
 class Client:
     def __init__(self, url: str, username: str, robot_key: str, robot_token: str, retry_secs: int = 3, base_url: str = "https://agents.dyna.ai"):
         """
@@ -46,6 +91,67 @@ class Client:
         self.segment_code = None
         self.current_group = None
         self.current_session_id = None
+        
+        # Persistent HTTP session (keep-alive + connection pool) for REST calls
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        
+        # Persistent WebSocket, opened lazily and shared by sequential chats
+        self._ws = None
+        self._ws_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def close(self):
+        """Close the persistent HTTP session and WebSocket connection"""
+        self._session.close()
+        with self._ws_lock:
+            if self._ws is not None:
+                self._ws.close()
+                self._ws = None
+
+    @contextmanager
+    def _websocket(self, ssl_context=None):
+        """
+        Yield a lease on a WebSocket connection (`lease.ws`), reusing the persistent one when it is free
+        
+        If another call still holds the persistent connection (e.g. one abandoned by
+        the timeout wrapper), a one-off connection is used instead. The persistent
+        connection is only kept when the caller sets `lease.finished` after reading the
+        whole answer; otherwise unread frames would leak into the next question, so a
+        connection that raised or stopped early is closed rather than reused.
+        """
+        shared = self._ws_lock.acquire(blocking=False)
+        try:
+            if shared:
+                if self._ws is None or self._ws.protocol.state is not State.OPEN:
+                    self._ws = connect(self.url, ssl_context=ssl_context)
+                ws = self._ws
+            else:
+                ws = connect(self.url, ssl_context=ssl_context)
+            
+            lease = SimpleNamespace(ws=ws, finished=False)
+            try:
+                yield lease
+            except BaseException:
+                ws.close()
+                if shared:
+                    self._ws = None
+                raise
+            
+            if not shared or not lease.finished:
+                ws.close()
+                if shared:
+                    self._ws = None
+        finally:
+            if shared:
+                self._ws_lock.release()
 
     def create_segment_code(self, group=None):
         """Create a new segment code for conversation context"""
@@ -61,7 +167,7 @@ class Client:
             "cybertron_robot_token": self.robot_token,
         }
         try:
-            response = requests.post(url=url, json=body)
+            response = self._session.post(url=url, json=body)
             response.raise_for_status()
             result = response.json()
             if result.get('code') == '000000':
@@ -79,21 +185,52 @@ class Client:
         """Get current session ID"""
         return self.current_session_id
 
-    def send_msg(self, ws, question: str):
-        """Send message through WebSocket with segment_code"""
+    def build_msg(self, question: str) -> dict:
+        """Build the WebSocket message payload with segment_code"""
         if not self.segment_code:
             self.create_segment_code()
             
-        message = {
+        return {
             "cybertron_robot_key": self.robot_key,
             "cybertron_robot_token": self.robot_token,
             "question": question,
             "username": self.username,
             "segment_code": self.segment_code
         }
+
+    def send_msg(self, ws, question: str):
+        """Send message through WebSocket with segment_code"""
+        message = self.build_msg(question)
         logging.debug(f"Sending message: {message}")
         ws.send(json.dumps(message))
 
+    @staticmethod
+    def _is_flow_jump(answer, after_jump: bool = False) -> bool:
+        """
+        Whether a flow frame's answer is a flow_jump marker
+        
+        Before the jump any answer starting with "flow_jump" triggers it; after the
+        jump only the bare "flow_jump" marker is skipped and other answers are kept.
+        """
+        if after_jump:
+            return answer == "flow_jump"
+        return isinstance(answer, str) and answer.startswith("flow_jump")
+
+    @staticmethod
+    def _wire_latency(message_json: dict):
+        """
+        Network latency of a frame, from the server-side `created` timestamp to local receipt
+        
+        Returns None when the server does not tag the frame with `created`.
+        """
+        created = message_json.get("created")
+        if created is None:
+            return None
+        try:
+            return time.time() - float(created)
+        except (TypeError, ValueError):
+            return None
+
     def receive_msg(self, ws):
         """Receive message from WebSocket"""
         message = ws.recv()
@@ -177,6 +314,29 @@ class Client:
         
         return result[0]
 
+    def batch_chat(self, questions: list, timeout: int = 40, record_timing: bool = True, max_workers: int = 4,
+                   growth_factor: float = 3.0, rate_limiter: TokenBucket = None) -> list:
+        """
+        Send a batch of questions and collect the answers in one call
+        
+        The WebSocket API accepts a single question per message, so the batch is
+        dispatched concurrently through AsyncClient and demultiplexed back into input order.
+        
+        Args:
+            questions: The questions to ask
+            timeout: Timeout in seconds for each question
+            record_timing: Whether to record timing information
+            max_workers: Maximum number of concurrent requests
+            growth_factor: Factor by which concurrency ramps up after each clean batch
+            rate_limiter: Optional token bucket every request must pass
+            
+        Returns:
+            List of dicts containing answer and timing information, one per question
+        """
+        async_client = AsyncClient(self, concurrency=max_workers, growth_factor=growth_factor,
+                                   rate_limiter=rate_limiter)
+        return asyncio.run(async_client.chat_many(questions, timeout=timeout, record_timing=record_timing))
+
     def websocket_chat(self, question: str, max_retries: int = 3) -> str:
         """
         Send question and receive answer using WebSocket connection
@@ -217,12 +377,13 @@ class Client:
                     ssl_context.check_hostname = False
                     ssl_context.verify_mode = ssl.CERT_NONE
                 
-                # Connect to WebSocket server with a custom timeout
+                # Connect to WebSocket server (or reuse the persistent connection)
                 # Note: connect() doesn't accept a timeout parameter directly
                 # We'll rely on the thread-based timeout in websocket_chat_with_timeout
-                with connect(self.url, ssl_context=ssl_context) as websocket:
-                    # Record start time
-                    start_time = time.time() if record_timing else None
+                with self._websocket(ssl_context) as lease:
+                    websocket = lease.ws
+                    # Record start time (after the handshake, so connection setup is excluded)
+                    start_time = time.perf_counter() if record_timing else None
                     
                     # Send the question
                     self.send_msg(websocket, question)
@@ -231,11 +392,17 @@ class Client:
                     receive_message = ""
                     receive_count = 0
                     use_send_again = False
+                    # Whether the server marked the answer complete (vs. hitting a frame cap)
+                    finished = False
                     first_response_time = None
+                    first_token_wire_time = None
+                    token_count = 0
                     
                     while True:
                         receive_count += 1
                         message_json = self.receive_msg(websocket)
+                        # Timestamp the frame as soon as it arrives, before any processing
+                        received_at = time.perf_counter() if record_timing else None
                         
                         if not message_json:
                             if receive_count > 5:  # Prevent infinite loop
@@ -256,11 +423,15 @@ class Client:
                                     
                                     # Record first response time
                                     if record_timing and first_response_time is None and _message and start_time is not None:
-                                        first_response_time = time.time() - start_time
+                                        first_response_time = received_at - start_time
+                                        first_token_wire_time = self._wire_latency(message_json)
                                     
                                     receive_message += _message
+                                    if _message:
+                                        token_count += 1
 
-                            if message_json.get("finish") == "y" or receive_count > 100:
+                            finished = message_json.get("finish") == "y"
+                            if finished or receive_count > 100:
                                 break
                                 
                         # Process JSON type messages
@@ -274,7 +445,10 @@ class Client:
                                 
                                 # Record first response time for JSON responses
                                 if record_timing and first_response_time is None and receive_message and start_time is not None:
-                                    first_response_time = time.time() - start_time
+                                    first_response_time = received_at - start_time
+                                    first_token_wire_time = self._wire_latency(message_json)
+                                token_count = 1 if receive_message else 0
+                            finished = True
                             break
                             
                         # Process flow type messages
@@ -282,7 +456,7 @@ class Client:
                             if message_json.get('code') == "000000":
                                 if message_json["data"].get('final') is True:
                                     # Check if answer is a flow_jump
-                                    if message_json["data"].get('answer', "").startswith("flow_jump"):
+                                    if self._is_flow_jump(message_json["data"].get('answer', "")):
                                         use_send_again = True
                                         break
                                     else:
@@ -290,11 +464,15 @@ class Client:
                                         
                                         # Record first response time for flow responses
                                         if record_timing and first_response_time is None and flow_answer and start_time is not None:
-                                            first_response_time = time.time() - start_time
+                                            first_response_time = received_at - start_time
+                                            first_token_wire_time = self._wire_latency(message_json)
                                         
                                         receive_message += flow_answer
+                                        if flow_answer:
+                                            token_count += 1
 
-                                if message_json['data'].get('node_answer_finish') == "y" or receive_count > 100:
+                                finished = message_json['data'].get('node_answer_finish') == "y"
+                                if finished or receive_count > 100:
                                     break
                     
                     # Handle flow jump if needed
@@ -302,6 +480,7 @@ class Client:
                         self.send_msg(websocket, "")
                         receive_message = ""
                         receive_count = 0
+                        finished = False
                         
                         while True:
                             receive_count += 1
@@ -320,7 +499,8 @@ class Client:
                             if msg_type == "string":
                                 if message_json.get("index") not in [-1, -2] and message_json.get('code') == "000000":
                                     receive_message += message_json.get("data", "")
-                                if message_json.get("finish") == "y" or receive_count > 100:
+                                finished = message_json.get("finish") == "y"
+                                if finished or receive_count > 100:
                                     break
                                     
                             elif msg_type == "json":
@@ -330,25 +510,32 @@ class Client:
                                         receive_message = json.dumps(answer, ensure_ascii=False)
                                     else:
                                         receive_message = answer
+                                finished = True
                                 break
                                 
                             elif msg_type == "flow":
                                 if message_json.get('code') == "000000":
-                                    if message_json["data"].get('answer') == "flow_jump":
+                                    if self._is_flow_jump(message_json["data"].get('answer'), after_jump=True):
                                         continue
                                     if message_json["data"].get('final') is True:
                                         receive_message += message_json["data"].get('answer', "")
-                                    if message_json['data'].get('node_answer_finish') == "y" or receive_count > 100:
+                                    finished = message_json['data'].get('node_answer_finish') == "y"
+                                    if finished or receive_count > 100:
                                         break
+                    
+                    # Only a fully read answer leaves the connection clean enough to reuse
+                    lease.finished = finished
                 
                 # Calculate total response time
-                total_response_time = time.time() - start_time if start_time is not None else None
+                total_response_time = time.perf_counter() - start_time if start_time is not None else None
                 
                 # Return result with timing information
                 return {
                     'answer': receive_message,
                     'first_token_response_time': first_response_time,
+                    'first_token_wire_time': first_token_wire_time,
                     'total_response_time': total_response_time,
+                    'token_count': token_count,
                     'attempt': attempt + 1
                 }
                 
@@ -370,4 +557,290 @@ class Client:
             'first_token_response_time': None,
             'total_response_time': None,
             'attempt': max_retries
-        }
\ No newline at end of file
+        }
+
+
+class AsyncClient:
+    """
+    asyncio WebSocket client that answers many questions concurrently
+    
+    Questions are sent in batches whose size starts at 1 and grows by
+    growth_factor after every clean batch (1, 3, 9, ...) up to concurrency.
+    A rate-limited (HTTP 429) batch halves the size and backs off; timed-out
+    questions are reported as failed without a retry.
+    Open connections are pooled and reused, so the handshake is paid once per
+    connection instead of once per question.
+    """
+
+    def __init__(self, client: Client, concurrency: int = 4, max_retries: int = 3, growth_factor: float = 3.0,
+                 rate_limiter: TokenBucket = None):
+        """
+        Initialize async client
+        
+        Args:
+            client: Configured Client providing credentials and segment_code
+            concurrency: Maximum number of concurrent requests
+            max_retries: Maximum number of attempts per question
+            growth_factor: Factor by which the batch size grows after a clean batch
+            rate_limiter: Optional token bucket every request must pass
+        """
+        self.client = client
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.growth_factor = growth_factor
+        self.rate_limiter = rate_limiter
+
+    def _ssl_context(self):
+        """Create SSL context for secure WebSocket if needed"""
+        if not self.client.is_wss:
+            return None
+        ssl_context = ssl.create_default_context()
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+        return ssl_context
+
+    @staticmethod
+    def _failed(answer: str, attempt: int) -> dict:
+        """Result dict for a failed question"""
+        return {
+            'answer': answer,
+            'first_token_response_time': None,
+            'first_token_wire_time': None,
+            'total_response_time': None,
+            'token_count': None,
+            'attempt': attempt
+        }
+
+    async def _send_msg(self, ws, question: str):
+        """Send message through WebSocket with segment_code"""
+        message = self.client.build_msg(question)
+        logging.debug(f"Sending message: {message}")
+        await ws.send(json.dumps(message))
+
+    async def _receive_msg(self, ws) -> dict:
+        """Receive message from WebSocket"""
+        message = await ws.recv()
+        try:
+            return json.loads(message)
+        except Exception:
+            logging.error(f"Error receiving message: \n{traceback.format_exc()}")
+            return {}
+
+    async def _collect_answer(self, ws, start_time: float, follow_jump: bool = True):
+        """
+        Receive frames until the answer is complete
+        
+        Returns:
+            Dict with the answer, first token timing, number of content frames
+            received, whether a flow_jump was requested and whether the server
+            marked the answer complete (as opposed to hitting a frame cap)
+        """
+        receive_message = ""
+        receive_count = 0
+        first_response_time = None
+        first_token_wire_time = None
+        token_count = 0
+        flow_jump = False
+        finished = False
+        
+        while True:
+            receive_count += 1
+            message_json = await self._receive_msg(ws)
+            received_at = time.perf_counter()
+            
+            if not message_json:
+                if receive_count > 5:  # Prevent infinite loop
+                    break
+                continue
+            
+            # Skip system messages
+            if message_json.get("index") in [-1, -2]:
+                # After a jump the closing frame may be a system message, so honour its finish flag
+                if not follow_jump and message_json.get("finish") == "y":
+                    finished = True
+                    break
+                continue
+            
+            msg_type = message_json.get("type")
+            token = ""
+            
+            if msg_type == "string":
+                if message_json.get('code') == "000000":
+                    token = message_json.get("data", "")
+                    receive_message += token
+                finished = message_json.get("finish") == "y"
+                done = finished or receive_count > 100
+            
+            elif msg_type == "json":
+                if message_json.get('code') == "000000":
+                    answer = message_json.get("data", {}).get("answer", {})
+                    receive_message = answer if isinstance(answer, str) else json.dumps(answer, ensure_ascii=False)
+                    token = receive_message
+                finished = done = True
+            
+            elif msg_type == "flow":
+                done = False
+                if message_json.get('code') == "000000":
+                    data = message_json["data"]
+                    answer = data.get('answer', "")
+                    if Client._is_flow_jump(answer, after_jump=not follow_jump):
+                        if follow_jump and data.get('final') is True:
+                            flow_jump = True
+                            break
+                        if not follow_jump:
+                            continue
+                    elif data.get('final') is True:
+                        token = answer
+                        receive_message += token
+                    finished = data.get('node_answer_finish') == "y"
+                    done = finished or receive_count > 100
+            
+            else:
+                done = False
+            
+            if token:
+                token_count += 1
+                # Record first response time
+                if first_response_time is None:
+                    first_response_time = received_at - start_time
+                    first_token_wire_time = Client._wire_latency(message_json)
+            
+            if done:
+                break
+        
+        return {
+            'answer': receive_message,
+            'first_token_response_time': first_response_time,
+            'first_token_wire_time': first_token_wire_time,
+            'token_count': token_count,
+            'flow_jump': flow_jump,
+            'finished': finished
+        }
+
+    async def _chat(self, ws, question: str, record_timing: bool) -> tuple:
+        """
+        Ask one question on an open connection
+        
+        Returns:
+            Tuple of (result dict, finished) where finished tells whether the whole
+            answer was read, i.e. whether the connection is safe to reuse
+        """
+        start_time = time.perf_counter()
+        await self._send_msg(ws, question)
+        collected = await self._collect_answer(ws, start_time)
+        answer = collected['answer']
+        finished = collected['finished']
+        
+        # Handle flow jump if needed
+        if collected['flow_jump']:
+            await self._send_msg(ws, "")
+            jumped = await self._collect_answer(ws, start_time, follow_jump=False)
+            answer = jumped['answer']
+            finished = jumped['finished']
+        
+        total_response_time = time.perf_counter() - start_time
+        result = {
+            'answer': answer,
+            'first_token_response_time': collected['first_token_response_time'] if record_timing else None,
+            'first_token_wire_time': collected['first_token_wire_time'] if record_timing else None,
+            'total_response_time': total_response_time if record_timing else None,
+            'token_count': collected['token_count'] if record_timing else None,
+            'attempt': 1
+        }
+        return result, finished
+
+    @staticmethod
+    async def _close(ws):
+        """Close a connection, ignoring errors"""
+        try:
+            await ws.close()
+        except Exception:
+            pass
+
+    async def _ask(self, idle: asyncio.Queue, question: str, timeout: int, record_timing: bool):
+        """
+        Ask one question on a pooled connection
+        
+        Returns:
+            Tuple of (result dict, status) where status is "ok", "throttled", "error" or "timeout"
+        """
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async()
+        
+        ws = None if idle.empty() else idle.get_nowait()
+        try:
+            if ws is None:
+                ws = await websockets.connect(self.client.url, ssl=self._ssl_context())
+            result, finished = await asyncio.wait_for(self._chat(ws, question, record_timing), timeout)
+        except asyncio.TimeoutError:
+            # The connection may still be streaming the old answer, so drop it
+            if ws is not None:
+                await self._close(ws)
+            # Not backpressure: an agent that is down would only time out again, so don't retry
+            return self._failed(f"Request failed: Timeout after {timeout} seconds", 1), "timeout"
+        except Exception as e:
+            logging.error(f"WebSocket chat error: {str(e)}")
+            if ws is not None:
+                await self._close(ws)
+            status = "throttled" if "429" in str(e) else "error"
+            return self._failed(f"Request failed: {str(e)}", 1), status
+        
+        # Unread frames of a capped answer would leak into the next question, so only pool clean connections
+        if finished:
+            idle.put_nowait(ws)
+        else:
+            await self._close(ws)
+        return result, "ok"
+
+    async def chat_many(self, questions: list, timeout: int = 40, record_timing: bool = True) -> list:
+        """
+        Answer all questions concurrently
+        
+        Args:
+            questions: The questions to ask
+            timeout: Timeout in seconds for each question
+            record_timing: Whether to record timing information
+            
+        Returns:
+            List of dicts containing answer and timing information, in input order
+        """
+        # Create the segment code up front so concurrent requests don't race to create it
+        if not self.client.segment_code:
+            self.client.create_segment_code()
+        
+        results = [None] * len(questions)
+        attempts = [0] * len(questions)
+        pending = deque(range(len(questions)))
+        idle = asyncio.Queue()
+        batch_size = 1
+        
+        try:
+            while pending:
+                batch = [pending.popleft() for _ in range(min(batch_size, len(pending)))]
+                outcomes = await asyncio.gather(
+                    *(self._ask(idle, questions[index], timeout, record_timing) for index in batch)
+                )
+                
+                statuses = set()
+                for index, (result, status) in zip(batch, outcomes):
+                    attempts[index] += 1
+                    result['attempt'] = attempts[index]
+                    results[index] = result
+                    statuses.add(status)
+                    if status in ("throttled", "error") and attempts[index] < self.max_retries:
+                        pending.append(index)
+                
+                if "throttled" in statuses:
+                    # Multiplicative decrease on backpressure
+                    batch_size = max(1, batch_size // 2)
+                    logging.warning(f"Rate limited, reducing batch size to {batch_size}")
+                    await asyncio.sleep(self.client.retry_secs)
+                elif "error" in statuses:
+                    await asyncio.sleep(self.client.retry_secs)
+                elif statuses == {"ok"}:
+                    batch_size = min(self.concurrency, max(batch_size + 1, int(batch_size * self.growth_factor)))
+        finally:
+            while not idle.empty():
+                await self._close(idle.get_nowait())
+        
+        return results
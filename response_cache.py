@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import Any, Optional
+
+
+class ResponseCache:
+    """
+    LLM响应的本地磁盘缓存，按提示词哈希存储，跨运行复用已获取的响应
+    """
+    
+    def __init__(self, path: str = 'llm_cache.sqlite'):
+        """
+        初始化响应缓存
+        
+        Args:
+            path (str): SQLite缓存文件路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL)'
+        )
+        self._conn.commit()
+    
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """根据提示词及相关参数生成缓存键"""
+        return hashlib.blake2b('\x1f'.join(parts).encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存，未命中时返回None"""
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM responses WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def set(self, key: str, value: Any):
+        """写入缓存"""
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, value) VALUES (?, ?)',
+                (key, json.dumps(value, ensure_ascii=False))
+            )
+            self._conn.commit()
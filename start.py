@@ -97,9 +97,13 @@ def check_project_structure():
     missing_files = []
     missing_dirs = []
     
+    # 一次扫描当前目录，后续用集合判断是否存在
+    with os.scandir('.') as entries:
+        present = {entry.name for entry in entries}
+    
     # 检查文件
     for file in required_files:
-        if not os.path.exists(file):
+        if file not in present:
             missing_files.append(file)
             print(f"   ❌ {file} (缺失)")
         else:
@@ -107,7 +111,7 @@ def check_project_structure():
     
     # 检查目录
     for dir in required_dirs:
-        if not os.path.exists(dir):
+        if dir not in present:
             missing_dirs.append(dir)
             print(f"   ❌ {dir}/ (缺失)")
         else:
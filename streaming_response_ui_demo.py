@@ -5,10 +5,39 @@
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import time
+import hashlib
+import inspect
+from pathlib import Path
 from ui_components import StreamingResponseMetricsComponents, ResultDisplayComponents
 from advanced_llm_analyzer import AdvancedLLMAnalyzer
 
+def _build_sample_data():
+    """构建示例数据，包含流式响应指标"""
+    idx = (np.arange(10) + 1).astype(str)
+    data = {
+        '场景': np.char.add('测试场景', idx),
+        '参考答案': np.char.add('参考答案', idx),
+        '生成答案1': np.char.add('生成答案', idx),
+        'llm_first_token_response_time': [
+            0.234, 0.567, 0.123, 0.789, 0.345,
+            0.678, 0.234, 0.567, 0.123, 0.789
+        ],
+        'llm_total_response_time': [
+            2.345, 3.678, 1.234, 4.567, 2.890,
+            3.456, 2.345, 3.678, 1.234, 4.567
+        ],
+        'llm_api_attempt': [1, 1, 2, 1, 1, 3, 1, 1, 2, 1],
+        'llm_overall_score': [85, 92, 78, 88, 90, 76, 89, 91, 84, 87]
+    }
+    return pd.DataFrame(data)
+
+# 示例数据磁盘缓存路径（跨进程复用，避免冷启动时重复构建）
+# 固定在脚本目录下；文件名带生成函数源码的哈希，修改示例数据后旧缓存自动失效
+SAMPLE_DATA_VERSION = hashlib.sha1(inspect.getsource(_build_sample_data).encode('utf-8')).hexdigest()[:12]
+SAMPLE_DATA_CACHE_PATH = Path(__file__).resolve().parent / ".cache" / f"sample_{SAMPLE_DATA_VERSION}.parquet"
+
 def main():
     st.set_page_config(
         page_title="流式响应UI演示",
@@ -31,22 +60,14 @@ def main():
     @st.cache_data
     def create_sample_data():
         """创建示例数据，包含流式响应指标"""
-        data = {
-            '场景': [f'测试场景{i+1}' for i in range(10)],
-            '参考答案': [f'参考答案{i+1}' for i in range(10)],
-            '生成答案1': [f'生成答案{i+1}' for i in range(10)],
-            'llm_first_token_response_time': [
-                0.234, 0.567, 0.123, 0.789, 0.345,
-                0.678, 0.234, 0.567, 0.123, 0.789
-            ],
-            'llm_total_response_time': [
-                2.345, 3.678, 1.234, 4.567, 2.890,
-                3.456, 2.345, 3.678, 1.234, 4.567
-            ],
-            'llm_api_attempt': [1, 1, 2, 1, 1, 3, 1, 1, 2, 1],
-            'llm_overall_score': [85, 92, 78, 88, 90, 76, 89, 91, 84, 87]
-        }
-        return pd.DataFrame(data)
+        if SAMPLE_DATA_CACHE_PATH.exists():
+            return pd.read_parquet(SAMPLE_DATA_CACHE_PATH)
+        
+        df = _build_sample_data()
+        
+        SAMPLE_DATA_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(SAMPLE_DATA_CACHE_PATH)
+        return df
     
     # 显示功能说明
     st.header("🔧 功能配置")
@@ -200,15 +221,17 @@ def main():
             response = requests.post(url, json=data, stream=True)
             
             first_byte_time = None
-            full_content = ""
+            buf = bytearray()
             
-            # 逐块读取响应
-            for chunk in response.iter_content(chunk_size=1):
+            # 按到达的数据块读取响应
+            for chunk in response.iter_content(chunk_size=None):
                 if chunk:
                     if first_byte_time is None:
                         first_byte_time = time.time()
                         first_token_response_time = first_byte_time - request_start_time
-                    full_content += chunk
+                    buf += chunk
+            
+            full_content = bytes(buf).decode('utf-8')
             
             total_response_time = time.time() - request_start_time
             
@@ -8,6 +8,10 @@ Advanced LLM Analysis 测试脚本
 import sys
 import time
 import json
+import functools
+import statistics
+import orjson
+import numpy as np
 import pandas as pd
 import requests
 from datetime import datetime
@@ -20,6 +24,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+@functools.lru_cache(maxsize=256)
+def _serialize_request_body(username, prompt):
+    """序列化请求体（相同提示词复用已序列化的bytes）"""
+    return orjson.dumps({
+        "username": username,
+        "question": prompt,
+        "segment_code": "qa_analysis"
+    })
+
 class LLMAnalysisTester:
     def __init__(self):
         """初始化测试器"""
@@ -118,10 +132,12 @@ class LLMAnalysisTester:
         print(f"\n🔍 测试3: 批量分析测试 ({sample_size}个样本)")
         
         # 创建测试DataFrame
+        idx = (np.arange(sample_size) + 1).astype(str)
+        suffix = '，包含轮胎规格185/65R15，价格$1142'
         test_df = pd.DataFrame({
-            '场景': [f'测试场景{i+1}' for i in range(sample_size)],
-            '参考答案': [f'这是参考答案{i+1}，包含轮胎规格185/65R15，价格$1142' for i in range(sample_size)],
-            '生成答案1': [f'这是生成答案{i+1}，包含轮胎规格185/65R15，价格$1142' for i in range(sample_size)]
+            '场景': np.char.add('测试场景', idx),
+            '参考答案': np.char.add(np.char.add('这是参考答案', idx), suffix),
+            '生成答案1': np.char.add(np.char.add('这是生成答案', idx), suffix)
         })
         
         print(f"📊 测试数据: {len(test_df)} 行")
@@ -174,13 +190,9 @@ class LLMAnalysisTester:
             'cybertron-robot-token': self.config['robot_token'],
             'Content-Type': 'application/json'
         }
-        data = {
-            "username": self.config['username'],
-            "question": prompt,
-            "segment_code": "qa_analysis"
-        }
+        body = _serialize_request_body(self.config['username'], prompt)
         
-        response = requests.post(url, headers=headers, json=data, timeout=timeout)
+        response = requests.post(url, headers=headers, data=body, timeout=timeout)
         response.raise_for_status()
         result = response.json()
         
@@ -271,8 +283,9 @@ class LLMAnalysisTester:
         print(f"✅ 批量分析测试: {'通过' if batch_ok else '失败'}")
         
         # 性能建议
-        if performance_results:
-            avg_time = sum(r['time'] for r in performance_results.values() if r['success']) / len([r for r in performance_results.values() if r['success']])
+        success_times = [r['time'] for r in performance_results.values() if r['success']]
+        if success_times:
+            avg_time = statistics.fmean(success_times)
             print(f"\n💡 性能分析:")
             print(f"   平均单次API调用时间: {avg_time:.2f}秒")
             print(f"   10个样本全面分析预计时间: {10 * 3 * avg_time:.0f}秒")
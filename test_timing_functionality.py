@@ -4,9 +4,10 @@
 """
 import sys
 import pandas as pd
+import numpy as np
 import streamlit as st
-import time
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 # 添加当前目录到路径
 sys.path.append('.')
@@ -30,13 +31,21 @@ if 'streamlit' not in sys.modules:
     st.session_state = MockSessionState()
 
 try:
-    from client import Client
+    from client import Client, TokenBucket
     from app import QAAnalyzer
     print("✅ 成功导入相关模块")
 except ImportError as e:
     print(f"❌ 导入模块失败: {e}")
     sys.exit(1)
 
+# 最大并发请求数及并发增长倍数（受服务端并发限制约束，可通过环境变量调整）
+MAX_CONCURRENT_REQUESTS = int(os.environ.get('TEST_MAX_BATCH', 4))
+BATCH_GROWTH_FACTOR = float(os.environ.get('TEST_BATCH_GROWTH', 3))
+
+# 请求速率上限（每秒请求数）及突发容量，有配额时请求不做额外等待
+RATE_LIMIT_PER_SECOND = float(os.environ.get('TEST_RATE_LIMIT', 5))
+RATE_LIMIT_BURST = int(os.environ.get('TEST_RATE_BURST', MAX_CONCURRENT_REQUESTS))
+
 def test_timing_functionality():
     """测试首字响应时间功能"""
     print("🔍 测试首字响应时间功能")
@@ -87,6 +96,7 @@ def test_timing_functionality():
         print(f"   📊 时间记录结果:")
         print(f"      答案: {timing_result['answer'][:50]}...")
         print(f"      首字响应时间: {timing_result['first_token_response_time']}")
+        print(f"      首字网络延迟: {timing_result.get('first_token_wire_time')}")
         print(f"      总响应时间: {timing_result['total_response_time']}")
         print(f"      重试次数: {timing_result['attempt']}")
         
@@ -116,33 +126,54 @@ def test_timing_functionality():
         col_name = '生成答案1'
         df[col_name] = ""
         
-        for idx in df.index:
-            # 检查是否启用首字响应时间记录
-            enable_first_token_timing = st.session_state.get('enable_first_token_timing', False)
+        # 检查是否启用首字响应时间记录
+        enable_first_token_timing = st.session_state.get('enable_first_token_timing', False)
+        print(f"   🔄 批量生成{len(df)}行答案（{'启用' if enable_first_token_timing else '不记录'}时间记录）...")
+        
+        # 一次提交全部问题，结果按输入顺序返回
+        results = client.batch_chat(
+            df['测试数据'].tolist(), timeout=10,
+            record_timing=enable_first_token_timing,
+            max_workers=MAX_CONCURRENT_REQUESTS,
+            growth_factor=BATCH_GROWTH_FACTOR,
+            rate_limiter=TokenBucket(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+        )
+        
+        if enable_first_token_timing:
+            # 列名与循环无关，只构造一次
+            ft_col = f'{col_name}_first_token_time'
+            tt_col = f'{col_name}_total_time'
+            at_col = f'{col_name}_attempt'
+            tc_col = f'{col_name}_token_count'
+            tpot_col = f'{col_name}_tpot'
             
-            if enable_first_token_timing:
-                print(f"   🔄 为第{idx+1}行生成答案（启用时间记录）...")
-                # 使用带有时间记录的方法
-                result = client.websocket_chat_with_timeout_and_timing(
-                    df.loc[idx, '测试数据'], timeout=10, record_timing=True
-                )
-                
+            # 预先分配类型化的时间列，避免逐行新增列导致的重复分配
+            df[ft_col] = np.nan
+            df[tt_col] = np.nan
+            df[at_col] = np.zeros(len(df), dtype=np.int32)
+            df[tc_col] = np.nan
+            
+            for idx, result in zip(df.index, results):
                 # 记录时间信息
                 if result['first_token_response_time'] is not None:
-                    df.loc[idx, f'{col_name}_first_token_time'] = result['first_token_response_time']
+                    df.at[idx, ft_col] = result['first_token_response_time']
                 if result['total_response_time'] is not None:
-                    df.loc[idx, f'{col_name}_total_time'] = result['total_response_time']
-                df.loc[idx, f'{col_name}_attempt'] = result['attempt']
+                    df.at[idx, tt_col] = result['total_response_time']
+                df.at[idx, at_col] = result['attempt']
+                if result.get('token_count') is not None:
+                    df.at[idx, tc_col] = result['token_count']
+                df.at[idx, col_name] = result['answer']
                 
-                df.loc[idx, col_name] = result['answer']
-                print(f"      首字响应时间: {result['first_token_response_time']}")
-                print(f"      总响应时间: {result['total_response_time']}")
-            else:
-                print(f"   🔄 为第{idx+1}行生成答案（不记录时间）...")
-                answer = client.websocket_chat_with_timeout(df.loc[idx, '测试数据'], timeout=10)
-                df.loc[idx, col_name] = answer
+                print(f"      第{idx+1}行 首字响应时间: {result['first_token_response_time']}")
+                print(f"      第{idx+1}行 总响应时间: {result['total_response_time']}")
             
-            time.sleep(1)  # 避免请求过快
+            # TPOT：首字之后每个内容帧的平均间隔，内容帧不超过1个时无法计算
+            df[tpot_col] = (df[tt_col] - df[ft_col]) / (df[tc_col] - 1).where(df[tc_col] > 1)
+            print("   📊 TTFT / TPOT 分布:")
+            print(df[[ft_col, tpot_col]].describe().round(3))
+        else:
+            for idx, result in zip(df.index, results):
+                df.at[idx, col_name] = result['answer']
         
         print(f"   📊 处理后DataFrame列: {df.columns.tolist()}")
         
@@ -154,14 +185,17 @@ def test_timing_functionality():
             print("   ❌ 未找到时间字段")
             return False
         
-        # 保存到Excel
+        # 后台保存到Excel，与字段校验重叠执行
         excel_file = 'timing_test_result.xlsx'
-        df.to_excel(excel_file, index=False)
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            write_future = writer.submit(df.to_excel, excel_file, index=False)
+            
+            # 验证Excel文件（写出的列即内存中的列，无需重新读取）
+            excel_timing_columns = [col for col in df.columns if 'first_token_time' in col or 'total_time' in col or 'attempt' in col]
+            
+            write_future.result()
         print(f"   📄 结果已保存到: {excel_file}")
         
-        # 验证Excel文件
-        df_read = pd.read_excel(excel_file)
-        excel_timing_columns = [col for col in df_read.columns if 'first_token_time' in col or 'total_time' in col or 'attempt' in col]
         if excel_timing_columns:
             print(f"   ✅ Excel文件包含时间字段: {excel_timing_columns}")
         else:
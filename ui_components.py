@@ -1,22 +1,130 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
+import codecs
+import csv
+import functools
+import io
+import logging
 import os
+import re
+from string import Template
+
+try:
+    import charset_normalizer
+    CHARSET_NORMALIZER_AVAILABLE = True
+except ImportError:
+    CHARSET_NORMALIZER_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 编码探测只看文件头部，足以判断BOM和字符集
+ENCODING_SNIFF_BYTES = 65536
+# 格式验证只需要表头，读取的字节数足够覆盖表头和第一条数据的开头
+HEADER_SNIFF_BYTES = 16384
+
+# 语言统计用的字符匹配模式，导入时编译一次
+CJK_PATTERN = re.compile(r'[\u4e00-\u9fff]')
+ACCENT_PATTERN = re.compile(r'[áéíóúñü]', re.IGNORECASE)
 
 # 注意：已移除matplotlib，使用plotly代替
 
-class UserGuideComponents:
-    """用户引导组件类"""
-    
-    @staticmethod
-    def show_welcome_guide():
-        """显示欢迎引导页面"""
-        if 'show_guide' not in st.session_state:
-            st.session_state.show_guide = True
-            
-        if st.session_state.show_guide:
-            # 美化的欢迎信息
-            st.markdown("""
+# 语言显示名称
+LANGUAGE_DISPLAY_NAMES = {
+    "auto": "🔄 自动检测",
+    "chinese": "🇨🇳 中文",
+    "spanish": "🇪🇸 西班牙语",
+    "english": "🇺🇸 英语"
+}
+
+# 语言选择器选项
+LANGUAGE_OPTIONS = {
+    "auto": "🔄 自动检测",
+    "chinese": "🇨🇳 中文 (Chinese)",
+    "spanish": "🇪🇸 西班牙语 (Español)",
+    "english": "🇺🇸 英语 (English)"
+}
+
+# 各语言的编码建议
+ENCODING_SUGGESTIONS = {
+    "auto": "将尝试多种编码",
+    "chinese": "建议: GBK, UTF-8",
+    "spanish": "建议: UTF-8, UTF-8-sig",
+    "english": "建议: UTF-8, ASCII"
+}
+
+# 各语言的处理提示
+LANGUAGE_TIPS = {
+    "auto": "💡 系统将自动检测最佳编码方式",
+    "chinese": "💡 中文文件通常使用GBK或UTF-8编码",
+    "spanish": "💡 西班牙语文件包含重音符号，建议使用UTF-8编码",
+    "english": "💡 英语文件通常使用UTF-8或ASCII编码"
+}
+
+# 各语言的编码检测顺序
+ENCODING_STRATEGIES = {
+    "auto": ['utf-8', 'utf-8-sig', 'gbk', 'gb2312', 'latin1'],
+    "chinese": ['gbk', 'gb2312', 'utf-8', 'utf-8-sig'],
+    "spanish": ['utf-8', 'utf-8-sig', 'latin1', 'iso-8859-1'],
+    "english": ['utf-8', 'ascii', 'latin1', 'utf-8-sig']
+}
+
+# 各语言必需的列名
+REQUIRED_COLUMNS = {
+    "chinese": ['场景', '测试数据', '参考答案'],
+    "spanish": ['Pregunta', 'Contenido de Pregunta', 'Respuesta de Referencia'],
+    "spanish_mixed": ['问题', '问题内容', '参考答案'],  # 混合格式：中文列名，西班牙语内容
+    "english": ['Scene', 'Test Data', 'Reference Answer'],
+    "auto": []  # 自动检测时，尝试所有可能的列名组合
+}
+
+# 错误提示中使用的语言名称
+LANGUAGE_SHORT_NAMES = {
+    "chinese": "中文",
+    "spanish": "西班牙语", 
+    "english": "英语"
+}
+
+# 格式验证成功消息
+VALIDATION_SUCCESS_MESSAGES = {
+    "auto": "✅ 文件格式验证通过",
+    "chinese": "✅ 中文文件格式验证通过",
+    "spanish": "✅ Formato de archivo en español verificado",
+    "english": "✅ English file format verified"
+}
+
+# 分析摘要展示的质量指标列，顺序即展示顺序
+QUALITY_METRIC_COLUMNS = ('语义稳定性', '相关度', '完整度')
+
+# 摘要报告CSV的表头行
+SUMMARY_REPORT_HEADER = ('指标', '数值')
+
+# 数据预览标题
+PREVIEW_TITLES = {
+    "auto": "📊 数据预览",
+    "chinese": "📊 数据预览",
+    "spanish": "📊 Vista previa de datos",
+    "english": "📊 Data Preview"
+}
+
+# 数据预览信息模板，{rows}为预览行数，{total}为预估总行数
+PREVIEW_INFO_MESSAGES = {
+    "auto": "显示前{rows}行数据，总计约{total}行（预估）",
+    "chinese": "显示前{rows}行数据，总计约{total}行（预估）",
+    "spanish": "Mostrando las primeras {rows} filas, aproximadamente {total} filas en total",
+    "english": "Showing first {rows} rows, approximately {total} rows total"
+}
+
+# 数据预览失败消息模板
+PREVIEW_ERROR_MESSAGES = {
+    "auto": "数据预览失败: {error}",
+    "chinese": "数据预览失败: {error}",
+    "spanish": "Error en vista previa: {error}",
+    "english": "Data preview failed: {error}"
+}
+
+# 静态HTML片段在导入时构建一次，避免Streamlit每次rerun重复拼接
+_WELCOME_HTML = """
             <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
                         color: white; padding: 25px; border-radius: 20px; margin: 20px 0;
                         box-shadow: 0 8px 25px rgba(102, 126, 234, 0.3);">
@@ -29,11 +137,9 @@ class UserGuideComponents:
                     </p>
                 </div>
             </div>
-            """, unsafe_allow_html=True)
-            
-            # 美化的快速入门指南
-            with st.expander("🎯 快速入门指南", expanded=True):
-                st.markdown("""
+            """
+
+_QUICKSTART_HTML = """
                 <div style="background: linear-gradient(135deg, #a8edea 0%, #fed6e3 100%); 
                             color: #333; padding: 25px; border-radius: 15px; margin: 15px 0;
                             box-shadow: 0 4px 15px rgba(168, 237, 234, 0.2);">
@@ -76,12 +182,9 @@ class UserGuideComponents:
                         </div>
                     </div>
                 </div>
-                """, unsafe_allow_html=True)
-                
-                # 美化的确认按钮
-                col1, col2, col3 = st.columns([1, 1, 1])
-                with col2:
-                    st.markdown("""
+                """
+
+_CONFIRM_BUTTON_HTML = """
                     <div style="text-align: center; margin: 20px 0;">
                         <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
                                     color: white; padding: 15px 30px; border-radius: 25px; 
@@ -90,11 +193,106 @@ class UserGuideComponents:
                             <strong>✅ 我已了解，开始使用</strong>
                         </div>
                     </div>
-                    """, unsafe_allow_html=True)
-                    
-                    if st.button("我已了解，开始使用", key="start_using"):
-                        st.session_state.show_guide = False
-                        st.rerun()
+                    """
+
+_LANG_SELECTOR_HEADER_HTML = """
+        <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
+                    color: white; padding: 20px; border-radius: 15px; margin: 15px 0;
+                    box-shadow: 0 4px 15px rgba(102, 126, 234, 0.3);">
+            <h3 style="margin: 0; text-align: center; font-size: 1.3rem; font-weight: 600;">
+                🌐 选择文件语言
+            </h3>
+            <p style="margin: 10px 0 0 0; text-align: center; font-size: 0.9rem; opacity: 0.9;">
+                正确的语言选择有助于更好地处理您的数据
+            </p>
+        </div>
+        """
+
+_LANG_CONFIG_HTML = """
+        <div style="background: linear-gradient(135deg, #a8edea 0%, #fed6e3 100%); 
+                    color: #333; padding: 20px; border-radius: 15px; margin: 15px 0;
+                    box-shadow: 0 4px 15px rgba(168, 237, 234, 0.2);">
+            <h4 style="margin: 0 0 15px 0; text-align: center; color: #2c3e50;">
+                🎯 语言配置
+            </h4>
+        </div>
+        """
+
+_LANG_SELECT_LABEL_HTML = """
+            <div style="background: white; padding: 15px; border-radius: 10px; 
+                        box-shadow: 0 2px 10px rgba(0,0,0,0.1); margin: 10px 0;">
+                <h5 style="margin: 0 0 10px 0; color: #2c3e50;">请选择您的CSV文件语言</h5>
+            </div>
+            """
+
+
+# 状态指示器配置: 状态 -> (图标, streamlit状态, 颜色)
+STATUS_CONFIG = {
+    'success': ('✅', 'success', '#2e7d32'),
+    'error': ('❌', 'error', '#d32f2f'),
+    'warning': ('⚠️', 'warning', '#f57c00'),
+    'info': ('ℹ️', 'info', '#1976d2'),
+    'running': ('🔄', 'info', '#1976d2')
+}
+
+# 带参数的HTML片段预先解析为Template，每次渲染只做变量替换
+_STATUS_TMPL = Template("""
+            <div style="background: linear-gradient(135deg, ${color}20 0%, ${color}10 100%); 
+                        color: $color; padding: 15px; border-radius: 10px; margin: 10px 0;
+                        border-left: 4px solid $color;">
+                <div style="display: flex; align-items: center; gap: 10px;">
+                    <span style="font-size: 1.2rem;">$icon</span>
+                    <strong>$message</strong>
+                </div>
+            </div>
+            """)
+
+_METRIC_DELTA_TMPL = Template("""
+            <div style="color: $delta_color; font-size: 0.9rem; margin-top: 5px;">
+                $delta_icon $delta
+            </div>
+            """)
+
+_METRIC_TMPL = Template("""
+        <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
+                    color: white; padding: 20px; border-radius: 15px; margin: 10px 0;
+                    box-shadow: 0 4px 15px rgba(102, 126, 234, 0.3);">
+            <h3 style="margin: 0; font-size: 1.2rem; opacity: 0.9;">$title</h3>
+            <h2 style="margin: 10px 0 0 0; font-size: 2rem; font-weight: 700;">$value</h2>
+            $delta_html
+            <p style="margin: 10px 0 0 0; font-size: 0.9rem; opacity: 0.8;">$description</p>
+        </div>
+        """)
+
+_METRIC_GRID_TMPL = Template(
+    '<div style="display: grid; grid-template-columns: repeat($columns, 1fr); gap: 10px;">$cards</div>'
+)
+
+class UserGuideComponents:
+    """用户引导组件类"""
+    
+    @staticmethod
+    def show_welcome_guide():
+        """显示欢迎引导页面"""
+        # 引导已关闭时直接返回，不再渲染任何内容
+        if not st.session_state.setdefault('show_guide', True):
+            return
+        
+        # 美化的欢迎信息
+        st.markdown(_WELCOME_HTML, unsafe_allow_html=True)
+        
+        # 美化的快速入门指南
+        with st.expander("🎯 快速入门指南", expanded=True):
+            st.markdown(_QUICKSTART_HTML, unsafe_allow_html=True)
+            
+            # 美化的确认按钮
+            col1, col2, col3 = st.columns([1, 1, 1])
+            with col2:
+                st.markdown(_CONFIRM_BUTTON_HTML, unsafe_allow_html=True)
+                
+                if st.button("我已了解，开始使用", key="start_using"):
+                    st.session_state.show_guide = False
+                    st.rerun()
     
     @staticmethod
     def show_help_tooltip(help_text, key=None):
@@ -104,121 +302,98 @@ class UserGuideComponents:
     @staticmethod
     def show_status_indicator(status, message=""):
         """显示状态指示器"""
-        status_config = {
-            'success': ('✅', 'success', '#2e7d32'),
-            'error': ('❌', 'error', '#d32f2f'),
-            'warning': ('⚠️', 'warning', '#f57c00'),
-            'info': ('ℹ️', 'info', '#1976d2'),
-            'running': ('🔄', 'info', '#1976d2')
-        }
-        
-        if status in status_config:
-            icon, st_status, color = status_config[status]
+        if status in STATUS_CONFIG:
+            icon, st_status, color = STATUS_CONFIG[status]
             
             # 美化的状态指示器
-            st.markdown(f"""
-            <div style="background: linear-gradient(135deg, {color}20 0%, {color}10 100%); 
-                        color: {color}; padding: 15px; border-radius: 10px; margin: 10px 0;
-                        border-left: 4px solid {color};">
-                <div style="display: flex; align-items: center; gap: 10px;">
-                    <span style="font-size: 1.2rem;">{icon}</span>
-                    <strong>{message}</strong>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+            st.markdown(_STATUS_TMPL.safe_substitute(color=color, icon=icon, message=message),
+                        unsafe_allow_html=True)
     
     @staticmethod
     def create_metric_card(title, value, description="", delta=None):
-        """创建指标卡片"""
+        """创建指标卡片，返回卡片HTML"""
         # 美化的指标卡片
+        card_html = UserGuideComponents.metric_card_html(title, value, description, delta)
+        st.markdown(card_html, unsafe_allow_html=True)
+        return card_html
+    
+    @staticmethod
+    def metric_card_html(title, value, description="", delta=None):
+        """生成指标卡片的HTML，不直接渲染"""
         delta_html = ""
         if delta:
-            delta_color = "#2e7d32" if delta > 0 else "#d32f2f"
-            delta_icon = "📈" if delta > 0 else "📉"
-            delta_html = f"""
-            <div style="color: {delta_color}; font-size: 0.9rem; margin-top: 5px;">
-                {delta_icon} {delta:+.1f}
-            </div>
-            """
+            delta_html = _METRIC_DELTA_TMPL.safe_substitute(
+                delta_color="#2e7d32" if delta > 0 else "#d32f2f",
+                delta_icon="📈" if delta > 0 else "📉",
+                delta=f"{delta:+.1f}"
+            )
         
-        st.markdown(f"""
-        <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
-                    color: white; padding: 20px; border-radius: 15px; margin: 10px 0;
-                    box-shadow: 0 4px 15px rgba(102, 126, 234, 0.3);">
-            <h3 style="margin: 0; font-size: 1.2rem; opacity: 0.9;">{title}</h3>
-            <h2 style="margin: 10px 0 0 0; font-size: 2rem; font-weight: 700;">{value}</h2>
-            {delta_html}
-            <p style="margin: 10px 0 0 0; font-size: 0.9rem; opacity: 0.8;">{description}</p>
-        </div>
-        """, unsafe_allow_html=True)
+        return _METRIC_TMPL.safe_substitute(title=title, value=value, delta_html=delta_html,
+                                            description=description)
+    
+    @staticmethod
+    def render_metric_grid(cards):
+        """把一组指标卡片（键同metric_card_html参数的字典）拼成一段HTML，用一次st.markdown渲染"""
+        if not cards:
+            return
+        
+        # 每张卡片压缩成单行，避免模板里的缩进和空行被markdown当作代码块
+        cards_html = "".join(
+            " ".join(UserGuideComponents.metric_card_html(**card).split()) for card in cards
+        )
+        st.markdown(_METRIC_GRID_TMPL.safe_substitute(columns=len(cards), cards=cards_html),
+                    unsafe_allow_html=True)
 
 class DataValidationComponents:
     """数据验证组件类"""
     
+    # 模糊匹配时各类别的关键词，每个类别合并为一个正则，逐列只扫描一次
+    _CATEGORY_REGEXES = {
+        category: re.compile('|'.join(map(re.escape, patterns)))
+        for category, patterns in {
+            '场景类': ['场景', '问题', 'Scene', 'Pregunta'],
+            '测试数据类': ['测试数据', '问题内容', 'Test Data', 'Contenido'],
+            '参考答案类': ['参考答案', 'Reference', 'Respuesta']
+        }.items()
+    }
+    
+    # 自动检测时可接受的列名组合，按优先级排列
+    _ALL_POSSIBLE_COLUMN_SETS = (
+        (frozenset(['场景', '测试数据', '参考答案']), "中文"),
+        (frozenset(['Pregunta', 'Contenido de Pregunta', 'Respuesta de Referencia']), "西班牙语"),
+        (frozenset(['问题', '问题内容', '参考答案']), "西班牙语（混合格式）"),
+        (frozenset(['Scene', 'Test Data', 'Reference Answer']), "英语"),
+        # 添加更多灵活的匹配模式
+        (frozenset(['场景', '问题内容', '参考答案']), "中文（变体）"),
+        (frozenset(['问题', '测试数据', '参考答案']), "中文（变体2）")
+    )
+    
     @staticmethod
     def get_language_display_name(language):
         """获取语言的显示名称"""
-        language_names = {
-            "auto": "🔄 自动检测",
-            "chinese": "🇨🇳 中文",
-            "spanish": "🇪🇸 西班牙语",
-            "english": "🇺🇸 英语"
-        }
-        return language_names.get(language, language)
+        return LANGUAGE_DISPLAY_NAMES.get(language, language)
     
     @staticmethod
     def show_language_selector(key_suffix=""):
         """显示语言选择器"""
         # 美化的语言选择器标题
-        st.markdown("""
-        <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
-                    color: white; padding: 20px; border-radius: 15px; margin: 15px 0;
-                    box-shadow: 0 4px 15px rgba(102, 126, 234, 0.3);">
-            <h3 style="margin: 0; text-align: center; font-size: 1.3rem; font-weight: 600;">
-                🌐 选择文件语言
-            </h3>
-            <p style="margin: 10px 0 0 0; text-align: center; font-size: 0.9rem; opacity: 0.9;">
-                正确的语言选择有助于更好地处理您的数据
-            </p>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        # 语言选项
-        language_options = {
-            "auto": "🔄 自动检测",
-            "chinese": "🇨🇳 中文 (Chinese)",
-            "spanish": "🇪🇸 西班牙语 (Español)",
-            "english": "🇺🇸 英语 (English)"
-        }
+        st.markdown(_LANG_SELECTOR_HEADER_HTML, unsafe_allow_html=True)
         
         # 美化的选择区域
-        st.markdown("""
-        <div style="background: linear-gradient(135deg, #a8edea 0%, #fed6e3 100%); 
-                    color: #333; padding: 20px; border-radius: 15px; margin: 15px 0;
-                    box-shadow: 0 4px 15px rgba(168, 237, 234, 0.2);">
-            <h4 style="margin: 0 0 15px 0; text-align: center; color: #2c3e50;">
-                🎯 语言配置
-            </h4>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(_LANG_CONFIG_HTML, unsafe_allow_html=True)
         
         col1, col2 = st.columns([2, 1])
         
         with col1:
             # 美化的选择框
-            st.markdown("""
-            <div style="background: white; padding: 15px; border-radius: 10px; 
-                        box-shadow: 0 2px 10px rgba(0,0,0,0.1); margin: 10px 0;">
-                <h5 style="margin: 0 0 10px 0; color: #2c3e50;">请选择您的CSV文件语言</h5>
-            </div>
-            """, unsafe_allow_html=True)
+            st.markdown(_LANG_SELECT_LABEL_HTML, unsafe_allow_html=True)
             
             # 使用唯一的key避免冲突
             unique_key = f"selected_language{key_suffix}"
             selected_language = st.selectbox(
                 "请选择您的CSV文件语言",
-                options=list(language_options.keys()),
-                format_func=lambda x: language_options[x],
+                options=list(LANGUAGE_OPTIONS.keys()),
+                format_func=lambda x: LANGUAGE_OPTIONS[x],
                 key=unique_key,
                 help="选择文件语言可以优化编码检测和处理效果",
                 label_visibility="collapsed"
@@ -226,39 +401,25 @@ class DataValidationComponents:
         
         with col2:
             # 美化的编码建议
-            encoding_suggestions = {
-                "auto": "将尝试多种编码",
-                "chinese": "建议: GBK, UTF-8",
-                "spanish": "建议: UTF-8, UTF-8-sig",
-                "english": "建议: UTF-8, ASCII"
-            }
-            
             st.markdown(f"""
             <div style="background: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%); 
                         color: white; padding: 15px; border-radius: 10px; 
                         box-shadow: 0 4px 15px rgba(79, 172, 254, 0.3);">
                 <h5 style="margin: 0 0 10px 0; font-size: 1rem;">📝 编码建议</h5>
                 <p style="margin: 0; font-size: 0.9rem; opacity: 0.9;">
-                    {encoding_suggestions[selected_language]}
+                    {ENCODING_SUGGESTIONS[selected_language]}
                 </p>
             </div>
             """, unsafe_allow_html=True)
         
         # 美化的语言相关提示
-        language_tips = {
-            "auto": "💡 系统将自动检测最佳编码方式",
-            "chinese": "💡 中文文件通常使用GBK或UTF-8编码",
-            "spanish": "💡 西班牙语文件包含重音符号，建议使用UTF-8编码",
-            "english": "💡 英语文件通常使用UTF-8或ASCII编码"
-        }
-        
         st.markdown(f"""
         <div style="background: linear-gradient(135deg, #ffecd2 0%, #fcb69f 100%); 
                     color: #333; padding: 15px; border-radius: 10px; margin: 15px 0;
                     box-shadow: 0 4px 15px rgba(252, 182, 159, 0.2);">
             <div style="display: flex; align-items: center; gap: 10px;">
                 <span style="font-size: 1.2rem;">💡</span>
-                <strong style="color: #2c3e50;">{language_tips[selected_language]}</strong>
+                <strong style="color: #2c3e50;">{LANGUAGE_TIPS[selected_language]}</strong>
             </div>
         </div>
         """, unsafe_allow_html=True)
@@ -268,60 +429,44 @@ class DataValidationComponents:
     @staticmethod
     def get_encoding_strategy(language):
         """根据语言获取编码检测策略"""
-        strategies = {
-            "auto": ['utf-8', 'utf-8-sig', 'gbk', 'gb2312', 'latin1'],
-            "chinese": ['gbk', 'gb2312', 'utf-8', 'utf-8-sig'],
-            "spanish": ['utf-8', 'utf-8-sig', 'latin1', 'iso-8859-1'],
-            "english": ['utf-8', 'ascii', 'latin1', 'utf-8-sig']
-        }
-        return strategies.get(language, strategies["auto"])
+        return ENCODING_STRATEGIES.get(language, ENCODING_STRATEGIES["auto"])
     
     @staticmethod
     def _read_csv_with_encoding(uploaded_file, nrows=None, language="auto"):
         """智能编码检测读取CSV文件，增强处理长JSON字符串"""
-        encodings = DataValidationComponents.get_encoding_strategy(language)
+        # 以文件字节作为缓存键，验证和预览同一文件时不再重复解析
+        return _cached_read_csv(uploaded_file.getvalue(), nrows, language)
+    
+    @staticmethod
+    def _sniff_header(uploaded_file, language="auto"):
+        """只读取文件头部解析表头，返回(列名列表, 是否存在数据行)"""
+        raw = uploaded_file.getvalue()
+        head = raw[:HEADER_SNIFF_BYTES]
         
-        for encoding in encodings:
+        # 头部在多字节字符中间截断时仍应判定为UTF-8，否则会落到charset_normalizer的猜测上
+        for encoding in _candidate_encodings(head, language, partial=len(head) < len(raw)):
             try:
-                uploaded_file.seek(0)  # 重置文件指针
-                
-                # 使用增强的CSV解析参数来处理复杂内容
-                df = pd.read_csv(
-                    uploaded_file,
-                    nrows=nrows,
-                    encoding=encoding,
-                    quoting=1,  # 严格处理引号
-                    skipinitialspace=True,
-                    on_bad_lines='skip',
-                    dtype=str,  # 强制所有列为字符串，避免类型推断问题
-                    keep_default_na=False,  # 不要自动转换空值
-                    engine='python'  # 使用Python引擎更好地处理复杂CSV
-                )
-                
-                # 验证读取是否成功
-                if len(df.columns) >= 3:  # 至少要有3列
-                    return df
-                    
-            except (UnicodeDecodeError, pd.errors.ParserError) as e:
-                # 记录具体错误信息用于调试
-                import logging
-                logging.warning(f"CSV解析失败 (编码: {encoding}): {str(e)}")
+                # 增量解码器容忍截断在末尾的多字节字符，但仍会暴露真正的编码错误
+                text = codecs.getincrementaldecoder(encoding)().decode(head, final=False)
+            except (UnicodeDecodeError, LookupError):
                 continue
-        
-        # 如果所有编码都失败，抛出异常
-        raise UnicodeDecodeError("utf-8", b"", 0, 0, "无法识别文件编码，请尝试不同的语言选择或检查文件格式")
+            
+            reader = csv.reader(io.StringIO(text), skipinitialspace=True)
+            columns = next(reader, [])
+            if len(columns) >= 3:  # 至少要有3列
+                # 与pandas一致忽略空行，遇到第一条非空行即可判定有数据
+                has_rows = any(row for row in reader)
+                return columns, has_rows
+        
+        # 头部字节不足以解析出表头（如超长表头）时，退回pandas的nrows=0模式只解析表头行
+        df = _cached_read_csv(raw, nrows=0, language=language)
+        _, _, body = raw.partition(b'\n')
+        return list(df.columns), bool(body.strip())
     
     @staticmethod
     def get_required_columns(language):
         """根据语言获取必需的列名"""
-        column_mappings = {
-            "chinese": ['场景', '测试数据', '参考答案'],
-            "spanish": ['Pregunta', 'Contenido de Pregunta', 'Respuesta de Referencia'],
-            "spanish_mixed": ['问题', '问题内容', '参考答案'],  # 混合格式：中文列名，西班牙语内容
-            "english": ['Scene', 'Test Data', 'Reference Answer'],
-            "auto": []  # 自动检测时，尝试所有可能的列名组合
-        }
-        return column_mappings.get(language, column_mappings["chinese"])
+        return REQUIRED_COLUMNS.get(language, REQUIRED_COLUMNS["chinese"])
     
 
     
@@ -332,12 +477,12 @@ class DataValidationComponents:
             return False, "请先上传CSV文件"
         
         try:
-            # 智能编码检测
-            df = DataValidationComponents._read_csv_with_encoding(uploaded_file, nrows=5, language=language)
+            # 智能编码检测，只解析表头，避免分词包含长JSON的数据行
+            columns, has_rows = DataValidationComponents._sniff_header(uploaded_file, language=language)
             
             # 清理列名，去除可能的编码问题
             clean_columns = []
-            for col in df.columns:
+            for col in columns:
                 if isinstance(col, str):
                     # 修复常见的编码问题
                     clean_col = col.replace('答�?', '答案').replace('答案案', '答案')
@@ -345,46 +490,29 @@ class DataValidationComponents:
                 else:
                     clean_columns.append(str(col))
             
-            df.columns = clean_columns
+            column_set = set(clean_columns)
             
             if language == "auto":
                 # 自动检测模式：尝试所有语言的列名组合
-                all_possible_columns = [
-                    (['场景', '测试数据', '参考答案'], "中文"),
-                    (['Pregunta', 'Contenido de Pregunta', 'Respuesta de Referencia'], "西班牙语"),
-                    (['问题', '问题内容', '参考答案'], "西班牙语（混合格式）"),
-                    (['Scene', 'Test Data', 'Reference Answer'], "英语"),
-                    # 添加更多灵活的匹配模式
-                    (['场景', '问题内容', '参考答案'], "中文（变体）"),
-                    (['问题', '测试数据', '参考答案'], "中文（变体2）")
-                ]
-                
-                matched_format = None
-                for required_columns, detected_lang in all_possible_columns:
-                    missing_columns = [col for col in required_columns if col not in df.columns]
-                    if not missing_columns:
-                        matched_format = detected_lang
-                        break
+                matched_format = next(
+                    (detected_lang
+                     for required_columns, detected_lang in DataValidationComponents._ALL_POSSIBLE_COLUMN_SETS
+                     if required_columns <= column_set),
+                    None
+                )
                 
                 if matched_format:
                     return True, f"✅ 检测到{matched_format}文件格式，验证通过"
                 
                 # 如果精确匹配失败，尝试模糊匹配
-                available_cols = list(df.columns)
+                available_cols = clean_columns
                 
                 # 检查是否有包含关键词的列
-                key_patterns = {
-                    '场景类': ['场景', '问题', 'Scene', 'Pregunta'],
-                    '测试数据类': ['测试数据', '问题内容', 'Test Data', 'Contenido'],
-                    '参考答案类': ['参考答案', 'Reference', 'Respuesta']
-                }
-                
-                matched_categories = []
-                for category, patterns in key_patterns.items():
-                    for col in available_cols:
-                        if any(pattern in col for pattern in patterns):
-                            matched_categories.append(category)
-                            break
+                matched_categories = [
+                    category
+                    for category, regex in DataValidationComponents._CATEGORY_REGEXES.items()
+                    if any(regex.search(col) for col in available_cols)
+                ]
                 
                 if len(matched_categories) >= 2:  # 至少匹配两个必要类别
                     return True, f"✅ 检测到兼容的文件格式（模糊匹配），可用列: {', '.join(available_cols[:5])}"
@@ -402,11 +530,11 @@ class DataValidationComponents:
                 required_columns = DataValidationComponents.get_required_columns(language)
                 if required_columns is None:
                     required_columns = []
-                missing_columns = [col for col in required_columns if col not in df.columns]
+                missing_columns = [col for col in required_columns if col not in column_set]
                 
                 if missing_columns:
                     # 尝试模糊匹配
-                    available_cols = list(df.columns)
+                    available_cols = clean_columns
                     fuzzy_matches = []
                     
                     for missing_col in missing_columns:
@@ -417,27 +545,15 @@ class DataValidationComponents:
                     if fuzzy_matches:
                         return True, f"✅ 检测到相似列名，可能兼容: {', '.join(fuzzy_matches)}"
                     
-                    lang_names = {
-                        "chinese": "中文",
-                        "spanish": "西班牙语", 
-                        "english": "英语"
-                    }
-                    lang_name = lang_names.get(language, language)
+                    lang_name = LANGUAGE_SHORT_NAMES.get(language, language)
                     return False, (f"❌ 缺少{lang_name}必要的列: {', '.join(missing_columns)}\n"
                                  f"📋 当前可用列: {', '.join(available_cols)}")
             
-            if len(df) == 0:
+            if not has_rows:
                 return False, "❌ 文件为空，请检查数据内容"
             
             # 根据语言显示不同的成功消息
-            success_messages = {
-                "auto": "✅ 文件格式验证通过",
-                "chinese": "✅ 中文文件格式验证通过",
-                "spanish": "✅ Formato de archivo en español verificado",
-                "english": "✅ English file format verified"
-            }
-            
-            return True, success_messages.get(language, success_messages["auto"])
+            return True, VALIDATION_SUCCESS_MESSAGES.get(language, VALIDATION_SUCCESS_MESSAGES["auto"])
             
         except UnicodeDecodeError as e:
             return False, f"❌ 文件编码错误: 请尝试保存为UTF-8格式 ({str(e)})"
@@ -454,36 +570,17 @@ class DataValidationComponents:
             df = DataValidationComponents._read_csv_with_encoding(uploaded_file, nrows=max_rows, language=language)
             
             # 根据语言显示不同的标题
-            preview_titles = {
-                "auto": "📊 数据预览",
-                "chinese": "📊 数据预览",
-                "spanish": "📊 Vista previa de datos",
-                "english": "📊 Data Preview"
-            }
-            
-            st.subheader(preview_titles.get(language, preview_titles["auto"]))
+            st.subheader(PREVIEW_TITLES.get(language, PREVIEW_TITLES["auto"]))
             st.dataframe(df)
             
             # 根据语言显示不同的信息
-            info_messages = {
-                "auto": f"显示前{len(df)}行数据，总计约{len(df) * 20}行（预估）",
-                "chinese": f"显示前{len(df)}行数据，总计约{len(df) * 20}行（预估）",
-                "spanish": f"Mostrando las primeras {len(df)} filas, aproximadamente {len(df) * 20} filas en total",
-                "english": f"Showing first {len(df)} rows, approximately {len(df) * 20} rows total"
-            }
-            
-            st.info(info_messages.get(language, info_messages["auto"]))
+            info_template = PREVIEW_INFO_MESSAGES.get(language, PREVIEW_INFO_MESSAGES["auto"])
+            st.info(info_template.format(rows=len(df), total=len(df) * 20))
             
         except Exception as e:
             # 根据语言显示不同的错误消息
-            error_messages = {
-                "auto": f"数据预览失败: {str(e)}",
-                "chinese": f"数据预览失败: {str(e)}",
-                "spanish": f"Error en vista previa: {str(e)}",
-                "english": f"Data preview failed: {str(e)}"
-            }
-            
-            st.error(error_messages.get(language, error_messages["auto"]))
+            error_template = PREVIEW_ERROR_MESSAGES.get(language, PREVIEW_ERROR_MESSAGES["auto"])
+            st.error(error_template.format(error=str(e)))
     
     @staticmethod
     def show_language_statistics(language, df):
@@ -503,27 +600,21 @@ class DataValidationComponents:
             
         with col3:
             # 计算非空数据比例
-            non_empty_ratio = (df.notna().sum().sum() / (len(df) * len(df.columns)) * 100)
+            non_empty_ratio = df.count().sum() / df.size * 100
             st.metric("数据完整度", f"{non_empty_ratio:.1f}%")
             
         with col4:
             # 根据语言显示特定统计
             if language == "spanish":
-                # 计算包含重音符号的行数
-                accent_count = 0
-                for col in df.select_dtypes(include=['object']).columns:
-                    accent_count += df[col].astype(str).str.contains('[áéíóúñü]', case=False, na=False).sum()
-                st.metric("包含重音符号", accent_count)
+                # 计算包含重音符号的单元格数
+                st.metric("包含重音符号", _count_text_matches(df, ACCENT_PATTERN))
             elif language == "chinese":
-                # 计算包含中文字符的行数
-                chinese_count = 0
-                for col in df.select_dtypes(include=['object']).columns:
-                    chinese_count += df[col].astype(str).str.contains('[\u4e00-\u9fff]', na=False).sum()
-                st.metric("包含中文字符", chinese_count)
+                # 计算包含中文字符的单元格数
+                st.metric("包含中文字符", _count_text_matches(df, CJK_PATTERN))
             else:
                 # 显示数据大小
-                import sys
-                data_size = sys.getsizeof(df) / 1024  # KB
+                # 数据以字符串列读取，deep=True才能统计到字符串内容本身
+                data_size = df.memory_usage(deep=True).sum() / 1024  # KB
                 st.metric("数据大小", f"{data_size:.1f} KB")
         
         # 添加详细信息说明
@@ -550,6 +641,87 @@ class DataValidationComponents:
         with st.expander("📄 查看前10行数据"):
             st.dataframe(df.head(10))
 
+def _count_text_matches(df, pattern):
+    """把所有文本列堆叠成一个Series，用一次正则扫描统计匹配的单元格数"""
+    text = df.select_dtypes(include=['object'])
+    if text.empty:
+        return 0
+    return int(text.stack().str.contains(pattern, na=False).sum())
+
+def _is_utf8(file_bytes, partial=False):
+    """严格按UTF-8解码校验；partial为True时数据可能在多字节字符中间被截断，末尾不完整的字符不算错误"""
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(file_bytes, final=not partial)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+def _detect_encoding(file_bytes, partial=False):
+    """依次通过BOM、严格UTF-8解码、charset_normalizer探测编码，无法确定时返回None"""
+    sample = file_bytes[:ENCODING_SNIFF_BYTES]
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    # 能严格按UTF-8解码就是UTF-8；charset_normalizer会把部分UTF-8西班牙语文件误判为cp1250
+    if _is_utf8(file_bytes, partial):
+        return 'utf-8'
+    if CHARSET_NORMALIZER_AVAILABLE:
+        best = charset_normalizer.from_bytes(sample).best()
+        if best is not None:
+            return best.encoding
+    return None
+
+def _parse_csv_bytes(file_bytes, encoding, nrows=None):
+    """优先用C引擎解析，遇到解析错误再退回Python引擎处理复杂内容"""
+    # 使用增强的CSV解析参数来处理复杂内容
+    read_kwargs = dict(
+        nrows=nrows,
+        encoding=encoding,
+        quoting=1,  # 严格处理引号
+        skipinitialspace=True,
+        on_bad_lines='skip',
+        dtype=str,  # 强制所有列为字符串，避免类型推断问题
+        keep_default_na=False  # 不要自动转换空值
+    )
+    try:
+        return pd.read_csv(io.BytesIO(file_bytes), engine='c', **read_kwargs)
+    except pd.errors.ParserError:
+        return pd.read_csv(io.BytesIO(file_bytes), engine='python', **read_kwargs)
+
+@st.cache_data(show_spinner=False)
+def _df_to_csv_bytes(df):
+    """将DataFrame序列化为带BOM的CSV字节，同一结果集只序列化一次"""
+    return df.to_csv(index=False).encode('utf-8-sig')
+
+def _candidate_encodings(file_bytes, language="auto", partial=False):
+    """探测到的编码排在最前，其后是语言对应的编码列表"""
+    encodings = DataValidationComponents.get_encoding_strategy(language)
+    detected = _detect_encoding(file_bytes, partial)
+    if detected:
+        return [detected] + [enc for enc in encodings if enc != detected]
+    return encodings
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _cached_read_csv(file_bytes, nrows=None, language="auto"):
+    """按编码策略解析CSV字节内容，结果按(文件内容, nrows, language)缓存"""
+    # 先用探测到的编码解析一次，失败时才逐个尝试语言对应的编码列表
+    for encoding in _candidate_encodings(file_bytes, language):
+        try:
+            df = _parse_csv_bytes(file_bytes, encoding, nrows=nrows)
+            
+            # 验证读取是否成功
+            if len(df.columns) >= 3:  # 至少要有3列
+                return df
+                
+        except (UnicodeDecodeError, pd.errors.ParserError) as e:
+            # 记录具体错误信息用于调试
+            logger.warning(f"CSV解析失败 (编码: {encoding}): {str(e)}")
+            continue
+    
+    # 如果所有编码都失败，抛出异常
+    raise UnicodeDecodeError("utf-8", b"", 0, 0, "无法识别文件编码，请尝试不同的语言选择或检查文件格式")
+
 class AnalysisProgressComponents:
     """分析进度组件类"""
     
@@ -585,20 +757,16 @@ class AnalysisProgressComponents:
     @staticmethod
     def show_pause_controls(task_id):
         """显示暂停控制按钮"""
-        from datetime import datetime
-        
         col1, col2 = st.columns([1, 1])
         
-        # Generate unique timestamp for button keys to avoid duplicates
-        timestamp = int(datetime.now().timestamp() * 1000)
-        
+        # 按task_id生成稳定的key，rerun时按钮不会被当作新组件重新挂载
         with col1:
-            if st.button("⏸️ 暂停分析", key=f"pause_control_{task_id}_{timestamp}"):
+            if st.button("⏸️ 暂停分析", key=f"pause_control_{task_id}"):
                 st.session_state.analysis_paused = True
                 st.rerun()
         
         with col2:
-            if st.button("⏹️ 停止分析", key=f"stop_control_{task_id}_{timestamp}", type="secondary"):
+            if st.button("⏹️ 停止分析", key=f"stop_control_{task_id}", type="secondary"):
                 st.session_state.analysis_running = False
                 st.session_state.analysis_paused = False
                 st.rerun()
@@ -629,66 +797,46 @@ class ResultDisplayComponents:
         has_streaming_metrics = any('first_token' in col.lower() or 'total_response_time' in col.lower() 
                                    for col in df.columns)
         
+        # 本页用到的指标列一次性求均值，避免逐列调用mean()
+        first_token_cols = [col for col in df.columns if 'first_token' in col.lower()]
+        total_time_cols = [col for col in df.columns if 'total_response_time' in col.lower()]
+        quality_cols = [col for col in QUALITY_METRIC_COLUMNS if col in df.columns]
+        mean_cols = list(dict.fromkeys(first_token_cols[:1] + total_time_cols[:1] + quality_cols))
+        means = df[mean_cols].mean() if mean_cols else {}
+        
+        # 先收集全部卡片，再一次性渲染
+        cards = [{"title": "总样本数", "value": len(df)}]
+        
         if has_streaming_metrics:
-            # 显示流式响应指标
-            col1, col2, col3, col4, col5 = st.columns(5)
-            
-            with col1:
-                st.metric("总样本数", len(df))
-            
             # 首字响应时间
-            first_token_cols = [col for col in df.columns if 'first_token' in col.lower()]
             if first_token_cols:
-                with col2:
-                    avg_first_token = df[first_token_cols[0]].mean()
-                    st.metric("平均首字响应", f"{avg_first_token:.3f}s")
+                cards.append({"title": "平均首字响应", "value": f"{means[first_token_cols[0]]:.3f}s"})
             
             # 总响应时间
-            total_time_cols = [col for col in df.columns if 'total_response_time' in col.lower()]
             if total_time_cols:
-                with col3:
-                    avg_total_time = df[total_time_cols[0]].mean()
-                    st.metric("平均总响应", f"{avg_total_time:.3f}s")
+                cards.append({"title": "平均总响应", "value": f"{means[total_time_cols[0]]:.3f}s"})
             
             # 其他指标
-            with col4:
-                if '语义稳定性' in df.columns:
-                    avg_stability = df['语义稳定性'].mean()
-                    st.metric("平均语义稳定性", f"{avg_stability:.2%}")
-                elif '相关度' in df.columns:
-                    avg_relevance = df['相关度'].mean()
-                    st.metric("平均相关度", f"{avg_relevance:.2%}")
-            
-            with col5:
-                if '完整度' in df.columns:
-                    avg_completeness = df['完整度'].mean()
-                    st.metric("平均完整度", f"{avg_completeness:.2%}")
+            if '语义稳定性' in means:
+                cards.append({"title": "平均语义稳定性", "value": f"{means['语义稳定性']:.2%}"})
+            elif '相关度' in means:
+                cards.append({"title": "平均相关度", "value": f"{means['相关度']:.2%}"})
             
+            if '完整度' in means:
+                cards.append({"title": "平均完整度", "value": f"{means['完整度']:.2%}"})
+        else:
+            # 传统指标显示
+            for metric in QUALITY_METRIC_COLUMNS:
+                if metric in means:
+                    cards.append({"title": f"平均{metric}", "value": f"{means[metric]:.2%}"})
+        
+        UserGuideComponents.render_metric_grid(cards)
+        
+        if has_streaming_metrics:
             # 显示详细的流式响应指标
             with st.expander("🚀 详细流式响应指标"):
                 StreamingResponseMetricsComponents.show_streaming_metrics(df)
                 StreamingResponseMetricsComponents.show_performance_recommendations(df)
-        else:
-            # 传统指标显示
-            col1, col2, col3, col4 = st.columns(4)
-            
-            with col1:
-                st.metric("总样本数", len(df))
-            
-            with col2:
-                if '语义稳定性' in df.columns:
-                    avg_stability = df['语义稳定性'].mean()
-                    st.metric("平均语义稳定性", f"{avg_stability:.2%}")
-            
-            with col3:
-                if '相关度' in df.columns:
-                    avg_relevance = df['相关度'].mean()
-                    st.metric("平均相关度", f"{avg_relevance:.2%}")
-            
-            with col4:
-                if '完整度' in df.columns:
-                    avg_completeness = df['完整度'].mean()
-                    st.metric("平均完整度", f"{avg_completeness:.2%}")
     
     @staticmethod
     def show_export_options(df, filename_prefix="analysis_results"):
@@ -701,7 +849,7 @@ class ResultDisplayComponents:
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            csv_data = df.to_csv(index=False, encoding='utf-8-sig')
+            csv_data = _df_to_csv_bytes(df)
             st.download_button(
                 "📄 导出完整数据 (CSV)",
                 csv_data,
@@ -722,7 +870,7 @@ class ResultDisplayComponents:
         with col3:
             # 导出问题数据
             if '语义篡改' in df.columns:
-                problem_data = df[df['语义篡改'] == '是'].to_csv(index=False, encoding='utf-8-sig')
+                problem_data = _df_to_csv_bytes(df[df['语义篡改'] == '是'])
                 st.download_button(
                     "⚠️ 导出问题数据 (CSV)",
                     problem_data,
@@ -731,12 +879,12 @@ class ResultDisplayComponents:
                 )
     
     @staticmethod
+    @st.cache_data(show_spinner=False)
     def _create_summary_report(df):
-        """创建摘要报告"""
+        """创建摘要报告，直接写出带BOM的CSV字节，同一结果集只生成一次"""
         summary = []
         
         # 基本统计
-        summary.append(["指标", "数值"])
         summary.append(["总样本数", len(df)])
         
         # 质量指标
@@ -746,442 +894,483 @@ class ResultDisplayComponents:
                 avg_val = df[metric].mean()
                 summary.append([f"平均{metric}", f"{avg_val:.2%}"])
         
-        # 问题统计
+        # 问题统计，一次比较加求和得到所有问题列的计数
         problem_metrics = ['语义篡改', '缺失关键信息', '生成无关信息']
-        for metric in problem_metrics:
-            if metric in df.columns:
-                problem_count = len(df[df[metric] == '是'])
-                problem_rate = problem_count / len(df) * 100
-                summary.append([f"{metric}问题数", problem_count])
-                summary.append([f"{metric}问题率", f"{problem_rate:.1f}%"])
-        
-        return pd.DataFrame(summary).to_csv(index=False, encoding='utf-8-sig')
+        present = [metric for metric in problem_metrics if metric in df.columns]
+        problem_counts = df[present].eq('是').sum()
+        for metric in present:
+            problem_count = int(problem_counts[metric])
+            problem_rate = problem_count / len(df) * 100
+            summary.append([f"{metric}问题数", problem_count])
+            summary.append([f"{metric}问题率", f"{problem_rate:.1f}%"])
+        
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator='\n').writerows([SUMMARY_REPORT_HEADER] + summary)
+        return buffer.getvalue().encode('utf-8-sig')
 
-class AgentSelectionComponents:
-    """机器人选择组件类"""
+# 机器人卡片字段: (列名, 默认值, 视为缺失的取值)
+_AGENT_FIELD_DEFAULTS = (
+    ('url', 'N/A', ('N/A', '', 'nan', 'NaN')),
+    ('description', '暂无描述', ('', 'nan', 'NaN')),
+    ('username', 'N/A', ('', 'nan', 'NaN')),
+)
+
+def _clean_agent_column(series, default, invalid):
+    """非字符串或属于invalid的取值统一替换为default"""
+    is_text = series.map(type).eq(str)
+    return series.where(is_text & ~series.isin(invalid), default)
+
+def _truncate_column(series, width):
+    """整列截断到width个字符，超长的值末尾加省略号"""
+    return series.str.slice(0, width) + series.str.len().gt(width).map({True: '...', False: ''})
+
+def _build_agent_records(agents_df, key_suffix):
+    """对机器人表整体做一次空值清洗，返回卡片记录；name保留原值用于选择状态，其余字段为展示用的清洗结果，key_*为按钮key"""
+    df = pd.DataFrame({'name': agents_df['name']})
+    df['display_name'] = _clean_agent_column(agents_df['name'], 'Unknown Robot', ('', 'nan', 'NaN'))
+    for col, default, invalid in _AGENT_FIELD_DEFAULTS:
+        if col in agents_df.columns:
+            df[col] = _clean_agent_column(agents_df[col], default, invalid)
+        else:
+            df[col] = default
     
-    @staticmethod
-    def show_agent_cards(agents_df, key_suffix=""):
-        """显示机器人卡片选择界面"""
-        st.subheader("🤖 选择分析机器人")
-        
-        if agents_df.empty:
-            st.warning("⚠️ 暂无可用机器人，请先在 'Agent Management' 标签页添加机器人配置")
-            return None
-        
-        # 使用session state存储选择的机器人
-        session_key = f"selected_agent_card{key_suffix}"
-        if session_key not in st.session_state:
-            st.session_state[session_key] = agents_df.iloc[0]['name']
-        
-        # 计算卡片布局
-        agents_list = agents_df.to_dict('records')
-        cols_per_row = 3
-        num_rows = (len(agents_list) + cols_per_row - 1) // cols_per_row
-        
-        selected_agent = st.session_state[session_key]
-        
-        # 显示卡片网格
-        for row in range(num_rows):
-            cols = st.columns(cols_per_row)
+    # URL截断并按需加省略号：卡片显示30个字符，多选信息面板显示25个字符
+    df['url_display'] = _truncate_column(df['url'], 30)
+    df['url_short'] = _truncate_column(df['url'], 25)
+    
+    # 按钮key随记录一起缓存，渲染循环中不再逐个拼接
+    df['key_select'] = 'select_agent_' + df['display_name'] + key_suffix
+    df['key_deselect'] = 'deselect_agent_' + df['display_name'] + key_suffix
+    df['key_compact'] = 'compact_select_' + df['name'].astype(str) + key_suffix
+    return df.to_dict('records')
+
+# 按版本号缓存的条目每个会话、每次保存都会新增且无法被其他会话命中，需限制数量和存活时间
+AGENT_CACHE_MAX_ENTRIES = 64
+AGENT_CACHE_TTL = 3600
+
+@st.cache_data(show_spinner=False, max_entries=AGENT_CACHE_MAX_ENTRIES, ttl=AGENT_CACHE_TTL)
+def _sanitize_agents_hashed(agents_df, key_suffix):
+    """按DataFrame内容缓存清洗结果，每次调用都要对整表计算哈希"""
+    return _build_agent_records(agents_df, key_suffix)
+
+@st.cache_data(show_spinner=False, max_entries=AGENT_CACHE_MAX_ENTRIES, ttl=AGENT_CACHE_TTL)
+def _sanitize_agents_versioned(_agents_df, version, key_suffix):
+    """按版本号缓存清洗结果；参数名以下划线开头，st.cache_data不对DataFrame计算哈希"""
+    return _build_agent_records(_agents_df, key_suffix)
+
+def _sanitize_agents_df(agents_df, key_suffix="", version=None):
+    """返回清洗后的卡片记录；调用方提供机器人表版本号时按版本号命中缓存，否则按内容哈希"""
+    if version is None:
+        return _sanitize_agents_hashed(agents_df, key_suffix)
+    return _sanitize_agents_versioned(agents_df, version, key_suffix)
+
+# 机器人卡片HTML模板，选中态的强调色随单选/多选模式变化
+_CARD_SELECTED_TPL = """
+    <div style="
+        border: 3px solid {accent};
+        border-radius: 15px;
+        padding: 20px;
+        margin: 10px 0;
+        background: {bg};
+        box-shadow: 0 4px 12px {shadow};
+        transition: all 0.3s ease;
+        cursor: pointer;
+        position: relative;
+    ">
+        <div style="position: absolute; top: 10px; right: 15px; color: {accent}; font-size: 20px;">✓</div>
+        <h4 style="margin: 0 0 10px 0; color: #333; display: flex; align-items: center;">
+            🤖 {name}
+        </h4>
+        <p style="margin: 5px 0; color: #666; font-size: 14px;">
+            📝 {desc}
+        </p>
+        <p style="margin: 5px 0; color: #999; font-size: 12px;">
+            🌐 {url}
+        </p>
+        <p style="margin: 5px 0; color: #999; font-size: 12px;">
+            👤 {user}
+        </p>
+    </div>
+"""
+
+_CARD_UNSELECTED_TPL = """
+    <div style="
+        border: 2px solid #e0e0e0;
+        border-radius: 15px;
+        padding: 20px;
+        margin: 10px 0;
+        background: #fafafa;
+        box-shadow: 0 2px 8px rgba(0,0,0,0.1);
+        transition: all 0.3s ease;
+        cursor: pointer;
+    ">
+        <h4 style="margin: 0 0 10px 0; color: #333; display: flex; align-items: center;">
+            🤖 {name}
+        </h4>
+        <p style="margin: 5px 0; color: #666; font-size: 14px;">
+            📝 {desc}
+        </p>
+        <p style="margin: 5px 0; color: #999; font-size: 12px;">
+            🌐 {url}
+        </p>
+        <p style="margin: 5px 0; color: #999; font-size: 12px;">
+            👤 {user}
+        </p>
+    </div>
+"""
+
+# 选中态配色: 单选为蓝色，多选为绿色
+_CARD_SELECTED_STYLES = {
+    'single': {
+        'accent': '#1f77b4',
+        'bg': 'linear-gradient(135deg, #e3f2fd 0%, #f3e5f5 100%)',
+        'shadow': 'rgba(31, 119, 180, 0.3)'
+    },
+    'multi': {
+        'accent': '#4CAF50',
+        'bg': 'linear-gradient(135deg, #e8f5e8 0%, #f1f8e9 100%)',
+        'shadow': 'rgba(76, 175, 80, 0.3)'
+    }
+}
+
+# 已选机器人信息面板的Markdown模板
+_SELECTED_AGENT_INFO_TPL = """
+**🤖 机器人名称**: {name}
+
+**📝 描述**: {description}
+
+**🌐 连接地址**: {url}
+
+**👤 用户名**: {username}
+"""
+
+_MULTI_AGENT_INFO_TPL = """
+**🤖 {name}**
+
+📝 {description}
+
+🌐 {url}
+
+👤 {username}
+"""
+
+_PARALLEL_TEST_INFO_TPL = """
+🚀 **并行测试模式**：
+- 将同时向 {count} 个机器人发送相同的问题
+- 每个机器人的回答将独立生成和评估
+- 结果将自动进行对比分析
+- 预计时间：约 {count}x 正常分析时间
+"""
+
+# 视为缺失的占位取值
+_INVALID_AGENT_VALUES = frozenset({'nan', 'NaN', 'N/A', ''})
+
+def _clean_agent_value(value, default):
+    """单个字段的清洗：None、NaN等非字符串值及占位取值返回default"""
+    if not isinstance(value, str) or value in _INVALID_AGENT_VALUES:
+        return default
+    return value
+
+@st.cache_data(show_spinner=False, max_entries=AGENT_CACHE_MAX_ENTRIES, ttl=AGENT_CACHE_TTL)
+def _agents_by_name_hashed(agents_df):
+    """按DataFrame内容缓存名称索引"""
+    return {record['name']: record for record in agents_df.to_dict('records')}
+
+@st.cache_data(show_spinner=False, max_entries=AGENT_CACHE_MAX_ENTRIES, ttl=AGENT_CACHE_TTL)
+def _agents_by_name_versioned(_agents_df, version):
+    """按版本号缓存名称索引，不对DataFrame计算哈希"""
+    return {record['name']: record for record in _agents_df.to_dict('records')}
+
+def _agents_by_name(agents_df, version=None):
+    """按机器人名称索引原始配置记录，替代每次rerun的整列比较查找；缓存方式与_sanitize_agents_df一致"""
+    if version is None:
+        return _agents_by_name_hashed(agents_df)
+    return _agents_by_name_versioned(agents_df, version)
+
+# 一行卡片的容器，列数和间距与st.columns保持一致
+_CARD_ROW_TPL = """<div style="display: grid; grid-template-columns: repeat({columns}, 1fr); gap: 1rem;">
+{cards}
+</div>"""
+
+@functools.lru_cache(maxsize=512)
+def _agent_card_html(name, desc, url, user, is_selected, mode):
+    """生成单张机器人卡片的HTML，mode为'single'或'multi'，决定选中态配色；相同输入直接复用上次结果"""
+    card_ctx = {'name': name, 'desc': desc, 'url': url, 'user': user}
+    if is_selected:
+        return _CARD_SELECTED_TPL.format_map({**card_ctx, **_CARD_SELECTED_STYLES[mode]}).strip()
+    return _CARD_UNSELECTED_TPL.format_map(card_ctx).strip()
+
+def _agent_card_row_html(row_agents, selected_names, mode, columns):
+    """把一行机器人卡片拼成一段HTML，整行只需一次st.markdown"""
+    cards = "\n".join(
+        _agent_card_html(agent['display_name'], agent['description'], agent['url_display'], agent['username'],
+                         agent['name'] in selected_names, mode)
+        for agent in row_agents
+    )
+    return _CARD_ROW_TPL.format(columns=columns, cards=cards)
+
+# 机器人数量超过阈值时改为筛选+分页显示，每次只渲染一页卡片
+AGENT_GRID_PAGE_THRESHOLD = 12
+AGENT_GRID_PAGE_SIZE = 9
+
+def _paginate_agents(agents_list, key_prefix):
+    """机器人较多时显示筛选框和页码，返回当前页需要渲染的机器人"""
+    if len(agents_list) <= AGENT_GRID_PAGE_THRESHOLD:
+        return agents_list
+    
+    # 页码只通过session state赋初值：筛选回调也会写入该key，控件不能再传value
+    page_key = f"{key_prefix}_page"
+    st.session_state.setdefault(page_key, 1)
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        # 修改筛选条件时回到第一页
+        keyword = st.text_input("🔍 筛选机器人", key=f"{key_prefix}_filter",
+                                placeholder="输入名称或描述关键字",
+                                on_change=_set_agent_selection, args=(page_key, 1)).strip().lower()
+    if keyword:
+        agents_list = [agent for agent in agents_list
+                       if keyword in agent['display_name'].lower() or keyword in agent['description'].lower()]
+    
+    total_pages = max(1, -(-len(agents_list) // AGENT_GRID_PAGE_SIZE))
+    # 机器人被删除后总页数变少时，保留的页码可能越界，需在创建控件前收回到范围内
+    if st.session_state[page_key] > total_pages:
+        st.session_state[page_key] = total_pages
+    with col2:
+        page = int(st.number_input("页码", min_value=1, max_value=total_pages, step=1, key=page_key))
+    st.caption(f"共 {len(agents_list)} 个机器人，第 {page}/{total_pages} 页")
+    start = (page - 1) * AGENT_GRID_PAGE_SIZE
+    return agents_list[start:start + AGENT_GRID_PAGE_SIZE]
+
+def _set_agent_selection(session_key, value):
+    """按钮回调：写入选择结果，回调在重跑之前执行，点击本身即触发重跑"""
+    st.session_state[session_key] = value
+
+def _toggle_agent_selection(session_key, agent_name):
+    """按钮回调：多选模式下切换某个机器人的选中状态"""
+    # dict充当有序集合：O(1)增删，同时保留选择顺序（已选信息按此顺序分列显示）
+    selected_agents = dict.fromkeys(st.session_state[session_key])
+    if agent_name in selected_agents:
+        del selected_agents[agent_name]
+    else:
+        selected_agents[agent_name] = None
+    st.session_state[session_key] = list(selected_agents)
+
+def show_agent_cards(agents_df, key_suffix="", version=None):
+    """显示机器人卡片选择界面"""
+    st.subheader("🤖 选择分析机器人")
+    
+    if agents_df.empty:
+        st.warning("⚠️ 暂无可用机器人，请先在 'Agent Management' 标签页添加机器人配置")
+        return None
+    
+    # 使用session state存储选择的机器人
+    session_key = f"selected_agent_card{key_suffix}"
+    st.session_state.setdefault(session_key, agents_df.iloc[0]['name'])
+    
+    # 卡片区放在fragment中，点击选择只重跑这一部分而不是整个应用
+    _render_agent_cards(agents_df, key_suffix, session_key, version)
+    return st.session_state[session_key]
+
+@st.fragment
+def _render_agent_cards(agents_df, key_suffix, session_key, version):
+    """渲染单选卡片网格和当前选择信息（fragment）"""
+    # 计算卡片布局，使用缓存的清洗结果
+    agents_list = _paginate_agents(_sanitize_agents_df(agents_df, key_suffix, version), f"agent_cards{key_suffix}")
+    cols_per_row = 3
+    
+    selected_agent = st.session_state[session_key]
+    
+    # 显示卡片网格：每行卡片合并为一次st.markdown，按钮仍放在对应列中
+    for start in range(0, len(agents_list), cols_per_row):
+        row_agents = agents_list[start:start + cols_per_row]
+        st.markdown(_agent_card_row_html(row_agents, {selected_agent}, 'single', cols_per_row),
+                    unsafe_allow_html=True)
+        
+        for col, agent in zip(st.columns(cols_per_row), row_agents):
+            is_selected = agent['name'] == selected_agent
             
-            for col_idx in range(cols_per_row):
-                agent_idx = row * cols_per_row + col_idx
-                
-                if agent_idx < len(agents_list):
-                    agent = agents_list[agent_idx]
-                    
-                    with cols[col_idx]:
-                        # 判断是否为选中状态
-                        is_selected = agent['name'] == selected_agent
-                        
-                        # 显示卡片内容
-                        # 安全处理可能的NaN值和空值
-                        agent_url = agent.get('url', 'N/A')
-                        if not isinstance(agent_url, str) or agent_url in ['N/A', '', 'nan', 'NaN', None] or pd.isna(agent_url):
-                            agent_url = 'N/A'
-                        else:
-                            agent_url = str(agent_url)[:30] + ("..." if len(str(agent_url)) > 30 else "")
-                        
-                        agent_description = agent.get('description', '暂无描述')
-                        if not isinstance(agent_description, str) or agent_description in ['nan', 'NaN', '', None] or pd.isna(agent_description):
-                            agent_description = '暂无描述'
-                        
-                        agent_username = agent.get('username', 'N/A')
-                        if not isinstance(agent_username, str) or agent_username in ['nan', 'NaN', '', None] or pd.isna(agent_username):
-                            agent_username = 'N/A'
-                        
-                        # 确保机器人名称不为空
-                        agent_name = agent.get('name', 'Unknown')
-                        if not isinstance(agent_name, str) or agent_name in ['nan', 'NaN', '', None] or pd.isna(agent_name):
-                            agent_name = 'Unknown Robot'
-                        
-                        # 创建卡片容器
-                        if is_selected:
-                            # 选中状态 - 蓝色边框
-                            st.markdown(f"""
-                                <div style="
-                                    border: 3px solid #1f77b4;
-                                    border-radius: 15px;
-                                    padding: 20px;
-                                    margin: 10px 0;
-                                    background: linear-gradient(135deg, #e3f2fd 0%, #f3e5f5 100%);
-                                    box-shadow: 0 4px 12px rgba(31, 119, 180, 0.3);
-                                    transition: all 0.3s ease;
-                                    cursor: pointer;
-                                    position: relative;
-                                ">
-                                    <div style="position: absolute; top: 10px; right: 15px; color: #1f77b4; font-size: 20px;">✓</div>
-                                    <h4 style="margin: 0 0 10px 0; color: #333; display: flex; align-items: center;">
-                                        🤖 {agent_name}
-                                    </h4>
-                                    <p style="margin: 5px 0; color: #666; font-size: 14px;">
-                                        📝 {agent_description}
-                                    </p>
-                                    <p style="margin: 5px 0; color: #999; font-size: 12px;">
-                                        🌐 {agent_url}
-                                    </p>
-                                    <p style="margin: 5px 0; color: #999; font-size: 12px;">
-                                        👤 {agent_username}
-                                    </p>
-                                </div>
-                            """, unsafe_allow_html=True)
-                        else:
-                            # 未选中状态 - 灰色边框
-                            st.markdown(f"""
-                                <div style="
-                                    border: 2px solid #e0e0e0;
-                                    border-radius: 15px;
-                                    padding: 20px;
-                                    margin: 10px 0;
-                                    background: #fafafa;
-                                    box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-                                    transition: all 0.3s ease;
-                                    cursor: pointer;
-                                ">
-                                    <h4 style="margin: 0 0 10px 0; color: #333; display: flex; align-items: center;">
-                                        🤖 {agent_name}
-                                    </h4>
-                                    <p style="margin: 5px 0; color: #666; font-size: 14px;">
-                                        📝 {agent_description}
-                                    </p>
-                                    <p style="margin: 5px 0; color: #999; font-size: 12px;">
-                                        🌐 {agent_url}
-                                    </p>
-                                    <p style="margin: 5px 0; color: #999; font-size: 12px;">
-                                        👤 {agent_username}
-                                    </p>
-                                </div>
-                            """, unsafe_allow_html=True)
-                        
-                        # 点击按钮选择机器人
-                        if st.button(
-                            f"{'✅ 已选择' if is_selected else '选择此机器人'}", 
-                            key=f"select_agent_{agent_name}{key_suffix}",
-                            type="primary" if is_selected else "secondary",
-                            disabled=is_selected,
-                            use_container_width=True
-                        ):
-                            st.session_state[session_key] = agent['name']
-                            st.rerun()
-        
-        # 显示当前选择的机器人信息
-        selected_agent_info = agents_df[agents_df['name'] == selected_agent].iloc[0]
-        
-        # 安全处理选择的机器人信息中的NaN值
-        info_description = selected_agent_info.get('description', '暂无描述')
-        if not isinstance(info_description, str) or info_description in ['nan', 'NaN']:
-            info_description = '暂无描述'
-        
-        info_url = selected_agent_info.get('url', 'N/A')
-        if not isinstance(info_url, str) or info_url in ['nan', 'NaN']:
-            info_url = 'N/A'
-        
-        info_username = selected_agent_info.get('username', 'N/A')
-        if not isinstance(info_username, str) or info_username in ['nan', 'NaN']:
-            info_username = 'N/A'
+            with col:
+                # 点击按钮选择机器人，由回调写入session state
+                st.button(
+                    f"{'✅ 已选择' if is_selected else '选择此机器人'}", 
+                    key=agent['key_select'],
+                    type="primary" if is_selected else "secondary",
+                    disabled=is_selected,
+                    use_container_width=True,
+                    on_click=_set_agent_selection,
+                    args=(session_key, agent['name'])
+                )
+    
+    # 显示当前选择的机器人信息
+    selected_agent_info = _agents_by_name(agents_df, version)[selected_agent]
+    
+    # 安全处理选择的机器人信息中的NaN值
+    info_description = _clean_agent_value(selected_agent_info.get('description'), '暂无描述')
+    info_url = _clean_agent_value(selected_agent_info.get('url'), 'N/A')
+    info_username = _clean_agent_value(selected_agent_info.get('username'), 'N/A')
+    
+    st.markdown("---")
+    st.subheader("📋 当前选择的机器人")
+    
+    col1, col2 = st.columns([2, 1])
+    
+    with col1:
+        st.info(_SELECTED_AGENT_INFO_TPL.format(name=selected_agent_info['name'], description=info_description,
+                                                url=info_url, username=info_username))
+    
+    with col2:
+        # 显示连接状态指示器
+        st.metric("🔗 连接状态", "待检测", help="分析开始时会自动测试连接")
         
+        if st.button("🔧 管理机器人", use_container_width=True):
+            st.info("💡 请切换到 'Agent Management' 标签页管理机器人配置")
+
+def show_multi_agent_selection(agents_df, key_suffix="", version=None):
+    """显示多机器人选择界面"""
+    st.subheader("🤖 选择多个机器人进行并行测试")
+    
+    if agents_df.empty:
+        st.warning("⚠️ 暂无可用机器人，请先在 'Agent Management' 标签页添加机器人配置")
+        return []
+    
+    # 使用session state存储选择的机器人列表
+    session_key = f"selected_agents_multi{key_suffix}"
+    st.session_state.setdefault(session_key, [])
+    
+    # 添加选择模式说明
+    st.info("💡 **并行测试模式**: 可以同时选择多个机器人进行对比测试，最多支持3个机器人")
+    
+    # 卡片区放在fragment中，点击选择只重跑这一部分而不是整个应用
+    app_has_selection = bool(st.session_state[session_key])
+    _render_multi_agent_selection(agents_df, key_suffix, session_key, version, app_has_selection)
+    return st.session_state[session_key]
+
+@st.fragment
+def _render_multi_agent_selection(agents_df, key_suffix, session_key, version, app_has_selection):
+    """渲染多选卡片网格和已选机器人信息（fragment）；app_has_selection为上次整页运行时是否已有选择"""
+    # 调用方在未选择时会st.stop()，选择在空与非空之间切换时需整页重跑，后续的数据上传区才会出现或隐藏
+    if bool(st.session_state[session_key]) != app_has_selection:
+        st.rerun(scope="app")
+    
+    # 计算卡片布局，使用缓存的清洗结果
+    all_agents = _sanitize_agents_df(agents_df, key_suffix, version)
+    agents_list = _paginate_agents(all_agents, f"agent_multi{key_suffix}")
+    cols_per_row = 3
+    
+    selected_agents = st.session_state[session_key]
+    selected_set = set(selected_agents)
+    can_select = len(selected_agents) < 3
+    
+    # 显示卡片网格：每行卡片合并为一次st.markdown，按钮仍放在对应列中
+    for start in range(0, len(agents_list), cols_per_row):
+        row_agents = agents_list[start:start + cols_per_row]
+        st.markdown(_agent_card_row_html(row_agents, selected_set, 'multi', cols_per_row),
+                    unsafe_allow_html=True)
+        
+        for col, agent in zip(st.columns(cols_per_row), row_agents):
+            is_selected = agent['name'] in selected_set
+            
+            with col:
+                # 点击按钮选择/取消选择机器人，由回调切换选中状态
+                if is_selected:
+                    # 已选中，显示取消选择按钮
+                    st.button(
+                        "❌ 取消选择", 
+                        key=agent['key_deselect'],
+                        type="secondary",
+                        use_container_width=True,
+                        on_click=_toggle_agent_selection,
+                        args=(session_key, agent['name'])
+                    )
+                elif can_select:
+                    # 未选中，显示选择按钮
+                    st.button(
+                        "✅ 选择此机器人", 
+                        key=agent['key_select'],
+                        type="primary",
+                        use_container_width=True,
+                        on_click=_toggle_agent_selection,
+                        args=(session_key, agent['name'])
+                    )
+                else:
+                    # 已达上限，不再渲染禁用的按钮
+                    st.caption("❌ 已达上限（最多选择3个）")
+    
+    # 显示当前选择的机器人信息
+    if selected_agents:
         st.markdown("---")
-        st.subheader("📋 当前选择的机器人")
+        st.subheader(f"📋 已选择的机器人 ({len(selected_agents)}/3)")
         
-        col1, col2 = st.columns([2, 1])
+        # 显示选中的机器人卡片
+        cols = st.columns(len(selected_agents))
         
-        with col1:
-            st.info(f"""
-            **🤖 机器人名称**: {selected_agent_info['name']}
-            
-            **📝 描述**: {info_description}
-            
-            **🌐 连接地址**: {info_url}
+        # 直接使用清洗后的记录，URL已在清洗时截断
+        sanitized_by_name = {agent['name']: agent for agent in all_agents}
+        for idx, agent_name in enumerate(selected_agents):
+            agent_info = sanitized_by_name[agent_name]
             
-            **👤 用户名**: {info_username}
-            """)
+            with cols[idx]:
+                st.success(_MULTI_AGENT_INFO_TPL.format(name=agent_info['name'], description=agent_info['description'],
+                                                        url=agent_info['url_short'], username=agent_info['username']))
         
-        with col2:
-            # 显示连接状态指示器
-            st.metric("🔗 连接状态", "待检测", help="分析开始时会自动测试连接")
-            
-            if st.button("🔧 管理机器人", use_container_width=True):
-                st.info("💡 请切换到 'Agent Management' 标签页管理机器人配置")
+        # 显示并行测试说明
+        st.info(_PARALLEL_TEST_INFO_TPL.format(count=len(selected_agents)))
         
-        return selected_agent
+        # 全部清除按钮
+        st.button("🗑️ 清除所有选择", type="secondary",
+                  on_click=_set_agent_selection, args=(session_key, []))
+    
+    else:
+        st.info("📝 请至少选择一个机器人开始分析")
 
-    @staticmethod
-    def show_multi_agent_selection(agents_df, key_suffix=""):
-        """显示多机器人选择界面"""
-        st.subheader("🤖 选择多个机器人进行并行测试")
-        
-        if agents_df.empty:
-            st.warning("⚠️ 暂无可用机器人，请先在 'Agent Management' 标签页添加机器人配置")
-            return []
-        
-        # 使用session state存储选择的机器人列表
-        session_key = f"selected_agents_multi{key_suffix}"
-        if session_key not in st.session_state:
-            st.session_state[session_key] = []
-        
-        # 添加选择模式说明
-        st.info("💡 **并行测试模式**: 可以同时选择多个机器人进行对比测试，最多支持3个机器人")
-        
-        # 计算卡片布局
-        agents_list = agents_df.to_dict('records')
-        cols_per_row = 3
-        num_rows = (len(agents_list) + cols_per_row - 1) // cols_per_row
-        
-        selected_agents = st.session_state[session_key]
-        
-        # 显示卡片网格
-        for row in range(num_rows):
-            cols = st.columns(cols_per_row)
-            
-            for col_idx in range(cols_per_row):
-                agent_idx = row * cols_per_row + col_idx
-                
-                if agent_idx < len(agents_list):
-                    agent = agents_list[agent_idx]
-                    
-                    with cols[col_idx]:
-                        # 判断是否为选中状态
-                        is_selected = agent['name'] in selected_agents
-                        
-                        # 安全处理可能的NaN值和空值
-                        agent_url = agent.get('url', 'N/A')
-                        if not isinstance(agent_url, str) or agent_url in ['N/A', '', 'nan', 'NaN', None] or pd.isna(agent_url):
-                            agent_url = 'N/A'
-                        else:
-                            agent_url = str(agent_url)[:30] + ("..." if len(str(agent_url)) > 30 else "")
-                        
-                        agent_description = agent.get('description', '暂无描述')
-                        if not isinstance(agent_description, str) or agent_description in ['nan', 'NaN', '', None] or pd.isna(agent_description):
-                            agent_description = '暂无描述'
-                        
-                        agent_username = agent.get('username', 'N/A')
-                        if not isinstance(agent_username, str) or agent_username in ['nan', 'NaN', '', None] or pd.isna(agent_username):
-                            agent_username = 'N/A'
-                        
-                        # 确保机器人名称不为空
-                        agent_name = agent.get('name', 'Unknown')
-                        if not isinstance(agent_name, str) or agent_name in ['nan', 'NaN', '', None] or pd.isna(agent_name):
-                            agent_name = 'Unknown Robot'
-                        
-                        # 创建卡片容器
-                        if is_selected:
-                            # 选中状态 - 绿色边框
-                            st.markdown(f"""
-                                <div style="
-                                    border: 3px solid #4CAF50;
-                                    border-radius: 15px;
-                                    padding: 20px;
-                                    margin: 10px 0;
-                                    background: linear-gradient(135deg, #e8f5e8 0%, #f1f8e9 100%);
-                                    box-shadow: 0 4px 12px rgba(76, 175, 80, 0.3);
-                                    transition: all 0.3s ease;
-                                    cursor: pointer;
-                                    position: relative;
-                                ">
-                                    <div style="position: absolute; top: 10px; right: 15px; color: #4CAF50; font-size: 20px;">✓</div>
-                                    <h4 style="margin: 0 0 10px 0; color: #333; display: flex; align-items: center;">
-                                        🤖 {agent_name}
-                                    </h4>
-                                    <p style="margin: 5px 0; color: #666; font-size: 14px;">
-                                        📝 {agent_description}
-                                    </p>
-                                    <p style="margin: 5px 0; color: #999; font-size: 12px;">
-                                        🌐 {agent_url}
-                                    </p>
-                                    <p style="margin: 5px 0; color: #999; font-size: 12px;">
-                                        👤 {agent_username}
-                                    </p>
-                                </div>
-                            """, unsafe_allow_html=True)
-                        else:
-                            # 未选中状态 - 灰色边框
-                            st.markdown(f"""
-                                <div style="
-                                    border: 2px solid #e0e0e0;
-                                    border-radius: 15px;
-                                    padding: 20px;
-                                    margin: 10px 0;
-                                    background: #fafafa;
-                                    box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-                                    transition: all 0.3s ease;
-                                    cursor: pointer;
-                                ">
-                                    <h4 style="margin: 0 0 10px 0; color: #333; display: flex; align-items: center;">
-                                        🤖 {agent_name}
-                                    </h4>
-                                    <p style="margin: 5px 0; color: #666; font-size: 14px;">
-                                        📝 {agent_description}
-                                    </p>
-                                    <p style="margin: 5px 0; color: #999; font-size: 12px;">
-                                        🌐 {agent_url}
-                                    </p>
-                                    <p style="margin: 5px 0; color: #999; font-size: 12px;">
-                                        👤 {agent_username}
-                                    </p>
-                                </div>
-                            """, unsafe_allow_html=True)
-                        
-                        # 点击按钮选择/取消选择机器人
-                        if is_selected:
-                            # 已选中，显示取消选择按钮
-                            if st.button(
-                                "❌ 取消选择", 
-                                key=f"deselect_agent_{agent_name}{key_suffix}",
-                                type="secondary",
-                                use_container_width=True
-                            ):
-                                st.session_state[session_key] = [name for name in selected_agents if name != agent['name']]
-                                st.rerun()
-                        else:
-                            # 未选中，显示选择按钮
-                            can_select = len(selected_agents) < 3
-                            if st.button(
-                                f"{'✅ 选择此机器人' if can_select else '❌ 最多选择3个'}", 
-                                key=f"select_agent_{agent_name}{key_suffix}",
-                                type="primary" if can_select else "secondary",
-                                disabled=not can_select,
-                                use_container_width=True
-                            ):
-                                st.session_state[session_key] = selected_agents + [agent['name']]
-                                st.rerun()
+def show_compact_agent_selector(agents_df, key_suffix="", version=None):
+    """显示紧凑型机器人选择器（用于较小空间）"""
+    if agents_df.empty:
+        st.warning("⚠️ 暂无可用机器人")
+        return None
+    
+    session_key = f"selected_agent_compact{key_suffix}"
+    st.session_state.setdefault(session_key, agents_df.iloc[0]['name'])
+    
+    # 卡片区放在fragment中，点击选择只重跑这一部分而不是整个应用
+    _render_compact_agent_selector(agents_df, key_suffix, session_key, version)
+    return st.session_state[session_key]
+
+@st.fragment
+def _render_compact_agent_selector(agents_df, key_suffix, session_key, version):
+    """渲染紧凑型卡片（fragment）"""
+    agents_list = _sanitize_agents_df(agents_df, key_suffix, version)
+    selected_agent = st.session_state[session_key]
+    
+    # 水平排列的紧凑卡片
+    cols = st.columns(min(len(agents_list), 4))
+    
+    for idx, agent in enumerate(agents_list[:4]):  # 最多显示4个
+        is_selected = agent['name'] == selected_agent
         
-        # 显示当前选择的机器人信息
-        if selected_agents:
-            st.markdown("---")
-            st.subheader(f"📋 已选择的机器人 ({len(selected_agents)}/3)")
-            
-            # 显示选中的机器人卡片
-            cols = st.columns(len(selected_agents))
-            
-            for idx, agent_name in enumerate(selected_agents):
-                agent_info = agents_df[agents_df['name'] == agent_name].iloc[0]
-                
-                # 安全处理选择的机器人信息中的NaN值
-                info_description = agent_info.get('description', '暂无描述')
-                if not isinstance(info_description, str) or info_description in ['nan', 'NaN']:
-                    info_description = '暂无描述'
-                
-                info_url = agent_info.get('url', 'N/A')
-                if not isinstance(info_url, str) or info_url in ['nan', 'NaN']:
-                    info_url = 'N/A'
-                
-                info_username = agent_info.get('username', 'N/A')
-                if not isinstance(info_username, str) or info_username in ['nan', 'NaN']:
-                    info_username = 'N/A'
-                
-                with cols[idx]:
-                    st.success(f"""
-                    **🤖 {agent_info['name']}**
-                    
-                    📝 {info_description}
-                    
-                    🌐 {info_url[:25]}...
-                    
-                    👤 {info_username}
-                    """)
-            
-            # 显示并行测试说明
-            st.info(f"""
-            🚀 **并行测试模式**：
-            - 将同时向 {len(selected_agents)} 个机器人发送相同的问题
-            - 每个机器人的回答将独立生成和评估
-            - 结果将自动进行对比分析
-            - 预计时间：约 {len(selected_agents)}x 正常分析时间
-            """)
+        # 紧凑卡片使用原生边框容器，选中标记用Markdown颜色语法，无需HTML
+        with cols[idx], st.container(border=True):
+            if is_selected:
+                st.markdown(f"🤖 **{agent['display_name']}** :blue[✓]")
+            else:
+                st.markdown(f"🤖 {agent['display_name']}")
             
-            # 全部清除按钮
-            if st.button("🗑️ 清除所有选择", type="secondary"):
-                st.session_state[session_key] = []
-                st.rerun()
-        
-        else:
-            st.info("📝 请至少选择一个机器人开始分析")
-        
-        return selected_agents
+            st.button(
+                "选择", 
+                key=agent['key_compact'],
+                disabled=is_selected,
+                use_container_width=True,
+                on_click=_set_agent_selection,
+                args=(session_key, agent['name'])
+            )
 
-    @staticmethod
-    def show_compact_agent_selector(agents_df, key_suffix=""):
-        """显示紧凑型机器人选择器（用于较小空间）"""
-        if agents_df.empty:
-            st.warning("⚠️ 暂无可用机器人")
-            return None
-        
-        session_key = f"selected_agent_compact{key_suffix}"
-        if session_key not in st.session_state:
-            st.session_state[session_key] = agents_df.iloc[0]['name']
-        
-        agents_list = agents_df.to_dict('records')
-        selected_agent = st.session_state[session_key]
-        
-        # 水平排列的紧凑卡片
-        cols = st.columns(min(len(agents_list), 4))
-        
-        for idx, agent in enumerate(agents_list[:4]):  # 最多显示4个
-            with cols[idx]:
-                is_selected = agent['name'] == selected_agent
-                
-                # 紧凑卡片样式
-                if is_selected:
-                    st.markdown(f"""
-                        <div style="
-                            border: 2px solid #1f77b4;
-                            border-radius: 10px;
-                            padding: 10px;
-                            text-align: center;
-                            background: #e3f2fd;
-                            margin: 5px 0;
-                        ">
-                            <div style="font-size: 16px;">🤖</div>
-                            <div style="font-size: 12px; font-weight: bold;">{agent['name']}</div>
-                            <div style="color: #1f77b4; font-size: 16px;">✓</div>
-                        </div>
-                    """, unsafe_allow_html=True)
-                else:
-                    st.markdown(f"""
-                        <div style="
-                            border: 1px solid #ddd;
-                            border-radius: 10px;
-                            padding: 10px;
-                            text-align: center;
-                            background: #f9f9f9;
-                            margin: 5px 0;
-                        ">
-                            <div style="font-size: 16px;">🤖</div>
-                            <div style="font-size: 12px;">{agent['name']}</div>
-                        </div>
-                    """, unsafe_allow_html=True)
-                
-                if st.button(
-                    "选择", 
-                    key=f"compact_select_{agent['name']}{key_suffix}",
-                    disabled=is_selected,
-                    use_container_width=True
-                ):
-                    st.session_state[session_key] = agent['name']
-                    st.rerun()
-        
-        return selected_agent
+class AgentSelectionComponents:
+    """机器人选择组件类，保留原有调用方式，实现为上方的模块级函数"""
+    
+    agents_by_name = staticmethod(_agents_by_name)
+    show_agent_cards = staticmethod(show_agent_cards)
+    show_multi_agent_selection = staticmethod(show_multi_agent_selection)
+    show_compact_agent_selector = staticmethod(show_compact_agent_selector)
 
 class ConfigurationComponents:
     """配置组件类"""
@@ -1396,7 +1585,8 @@ class StreamingResponseMetricsComponents:
             
             # 格式化数值
             for col in ['平均值 (秒)', '最小值 (秒)', '最大值 (秒)', '标准差 (秒)']:
-                comparison_df[col] = comparison_df[col].apply(lambda x: f"{x:.3f}" if not pd.isna(x) else "N/A")
+                # 统计值均为浮点数，x == x 即排除NaN，无需逐个调用pd.isna
+                comparison_df[col] = comparison_df[col].apply(lambda x: f"{x:.3f}" if x == x else "N/A")
             
             st.dataframe(comparison_df, use_container_width=True)
         
@@ -1497,26 +1687,29 @@ class StreamingResponseMetricsComponents:
         else:
             st.success("�� 所有性能指标都在正常范围内！")
 
+# 常见错误关键字（已转小写）及对应的解决建议，按顺序匹配
+_ERROR_SOLUTIONS = (
+    ("websocket", "请检查网络连接和机器人配置"),
+    ("csv", "请检查文件格式和编码"),
+    ("timeout", "请减少样本数量或检查网络连接"),
+    ("permission", "请检查文件权限"),
+)
+
 class ErrorHandlingComponents:
     """错误处理组件类"""
     
     @staticmethod
     def show_error_details(error, context=""):
         """显示详细的错误信息"""
-        st.error(f"❌ 操作失败: {str(error)}")
+        error_text = str(error)
+        st.error(f"❌ 操作失败: {error_text}")
         
         with st.expander("🔍 错误详情和解决方案"):
-            st.code(str(error))
+            st.code(error_text)
             
             # 提供常见错误的解决方案
-            solutions = {
-                "WebSocket": "请检查网络连接和机器人配置",
-                "CSV": "请检查文件格式和编码",
-                "timeout": "请减少样本数量或检查网络连接",
-                "permission": "请检查文件权限"
-            }
-            
-            for keyword, solution in solutions.items():
-                if keyword.lower() in str(error).lower():
+            error_lower = error_text.lower()
+            for keyword, solution in _ERROR_SOLUTIONS:
+                if keyword in error_lower:
                     st.info(f"💡 建议: {solution}")
                     break 
\ No newline at end of file